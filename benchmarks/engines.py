@@ -0,0 +1,132 @@
+'''
+Runs a corpus of scripts on the interpreter and on the compiled engine, fails
+when their redirect urls differ or miss the url node gives for a script in
+EXPECTED, checks the pages in PAGES with and without the prescan, and reports
+the time each engine takes.
+
+usage: python benchmarks/engines.py [runs]
+'''
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jsinterpreter
+
+CORPUS = [
+    'function f(x) { return x + "/path"; } location.href = f("http://host");',
+    '''
+    var x = 0;
+    if (x) { location.href = "t"; } else if (x === 0) { location.href = "zero"; }
+    location.href = location.href + "-after";
+    ''',
+    '''
+    var x = 1;
+    if (x) { location.href = "a"; } else if (x === 0) { location.href = "zero"; }
+    location.href = location.href + "-after";
+    ''',
+    '''
+    var x = 0; var y = 0;
+    if (x) location.href = "a"; else if (y) location.href = "b"; else location.href = "c";
+    location.href = location.href + "!";
+    ''',
+    '''
+    var x = 0; var y = 1;
+    if (x) location.href = "a"; else if (y) location.href = "b"; else location.href = "c";
+    location.href = location.href + "!";
+    ''',
+    'var x = 1; if (x) if (0) location.href = "a"; else location.href = "b"; location.href = location.href + "!";',
+    '''
+    function f(x) { if (x === 1) { return "one"; } else if (x === 2) return "two"; else { return "many"; } }
+    location.href = f(1) + f(2) + f(3);
+    ''',
+    '''
+    var count = 1;
+    count += 2;
+    function neg(n) { if (n < 0) { return "neg"; } return; }
+    location.href = "http://host/" + count + neg(-1) + neg(1);
+    ''',
+    '''
+    var parts = "a-b-c".split("-");
+    var re = /(\\w+)@(\\w+)\\.com/;
+    var found = re.exec("mail bob@example.com now");
+    window.location.href = parts[1] + found[2] + "x.y".replace(/\\./g, function (m) { return "/"; });
+    ''',
+    '''
+    var a = 7; var b = 2; var s = "";
+    if (a === 7 && b === 2) s += "y"; if (a === 7 && b === 1) s += "n";
+    if (a === 1 || b === 2) s += "z"; if (a === 1 || b === 1) s += "w";
+    location.href = s;
+    ''',
+]
+
+# urls node.js gives for the same scripts
+EXPECTED = [
+    ('''
+    var m = "a333".match(/(3)(3)/);
+    location.href = "" + /a/g.test("aa") + "|" + m[2] + m.length + "|" + 1.5 + "|" + (2 * 3);
+    ''', 'true|33|1.5|6'),
+    ('''
+    var a = 7; var b = 2; var s = "x";
+    s += a / b; s += "|"; s += a - b * 3;
+    s += "," + (a < b); s += "," + (a >= 7); s += "," + (a == 7); s += "," + (a != b); s += "," + (b <= 1);
+    s += "," + (b > 1); s += "," + (a === 7); s += "," + (a !== "7"); s += "," + (s === 7); s += "," + ("ab" < "b");
+    var n = 1; n *= 6; n -= 1; n /= 2; n += 0.5;
+    location.href = s + "|" + n + (true + "") + (3 + 4 + "5");
+    ''', 'x3.5|1,false,true,true,true,false,true,true,true,false,true|3true75'),
+]
+CORPUS += [script for script, url in EXPECTED]
+
+# the <script> blocks of a page and the url it redirects to
+PAGES = [
+    (['var host = "http://example.com";', 'location.href = host + "/next";'], 'http://example.com/next'),
+    (['function path(p) { return "/" + p; }', 'var x = 1;', 'location.href = "http://h" + path("a") + x;'],
+     'http://h/a1'),
+]
+
+
+def run(engine, runs):
+    begin = time.perf_counter()
+    for i in range(runs):
+        urls = [jsinterpreter.script_text(script, hooks=(), engine=engine) for script in CORPUS]
+    return urls, time.perf_counter() - begin
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    # every run has to execute, not replay cached results
+    jsinterpreter.result_cache.enabled = False
+    expected, interpreter_time = run('interpreter', runs)
+    urls, compiled_time = run('compiled', runs)
+    print('interpreter %8.2f ms   compiled %8.2f ms' % (interpreter_time * 1000, compiled_time * 1000))
+    failed = 0
+    for script, want, got in zip(CORPUS, expected, urls):
+        if want != got:
+            failed += 1
+            print('differ: interpreter %r, compiled %r in\n%s' % (want, got, script))
+    for script, url in EXPECTED:
+        got = expected[CORPUS.index(script)]
+        if got != url:
+            failed += 1
+            print('wrong url: %r, node gives %r in\n%s' % (got, url, script))
+    for scripts, url in PAGES:
+        for engine in ['interpreter', 'compiled']:
+            for prescan in [False, True]:
+                try:
+                    got = jsinterpreter.run_scripts(scripts, prescan=prescan, hooks=(), engine=engine)
+                except SystemExit:
+                    # script errors are reported and exit(0)
+                    got = None
+                if got != url:
+                    failed += 1
+                    print('wrong url: %r, expected %r with %s engine, prescan=%s in\n%s'
+                          % (got, url, engine, prescan, scripts))
+    if failed > 0:
+        print('FAILED')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,95 @@
+'''
+Runs a small corpus of scripts over and over in one process, as a long lived
+worker does, and fails when traced memory keeps growing or when runs leave
+reference cycles behind for the cyclic garbage collector.
+
+usage: python benchmarks/soak.py [rounds] [interpreter|compiled]
+'''
+import gc
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jsinterpreter
+
+CORPUS = [
+    'function f(x) { return x + "/path"; } location.href = f("http://host");',
+    '''
+    var parts = "a-b-c".split("-");
+    var n = 12;
+    var label = n.toString();
+    function join(a, b) { var sep = "/"; return a + sep + b; }
+    window.location.href = join("http://host", parts[1] + label);
+    ''',
+    '''
+    var re = /(\\w+)@(\\w+)\\.com/g;
+    var found = re.exec("mail bob@example.com now");
+    var user = found[1];
+    var replaced = "x.y.z".replace(/\\./g, function (m) { return "/"; });
+    if (re.test("alice@host.com")) { location.href = "http://" + user + replaced; }
+    else { location.href = "http://none"; }
+    ''',
+    '''
+    var count = 0;
+    function add(step) { count += step; return count; }
+    add(1); add(2);
+    var check = function (value) { if (value > 2) { return "big"; } return "small"; };
+    var re = RegExp("a+", "g");
+    location.href = "http://host/" + check(count) + "/" + re.source + "/" + "caaab".match(re)[0];
+    ''',
+]
+
+# traced memory the second half of the rounds may add; the first half fills
+# the bounded caches and the allocator free lists
+TRACED_GROWTH_LIMIT = 64 * 1024
+
+
+def rss():
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def run_round(engine):
+    for script in CORPUS:
+        jsinterpreter.script_text(script, hooks=(), engine=engine)
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    engine = sys.argv[2] if len(sys.argv) > 2 else 'interpreter'
+
+    # every round has to execute, not replay cached results
+    jsinterpreter.result_cache.enabled = False
+    # runs must not need the cyclic collector, so it stays off while measuring
+    gc.collect()
+    gc.disable()
+    tracemalloc.start()
+    traced, rss_values = [], []
+    for i in range(rounds):
+        run_round(engine)
+        if i == rounds // 2 or i == rounds - 1:
+            traced.append(tracemalloc.get_traced_memory()[0])
+            rss_values.append(rss())
+    tracemalloc.stop()
+    cycles = gc.collect()
+    gc.enable()
+
+    growth = traced[-1] - traced[0]
+    print('%d scripts, engine %s' % (rounds * len(CORPUS), engine))
+    print('traced memory growth %8.1f KB' % (growth / 1024))
+    print('rss growth           %8.1f KB' % ((rss_values[-1] - rss_values[0]) / 1024))
+    print('objects in cycles    %8d' % cycles)
+    if growth > TRACED_GROWTH_LIMIT or cycles > 0:
+        print('FAILED')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,43 @@
+'''
+Measures what a freshly recycled worker pays: importing the package and
+running its first script, each in a new interpreter process.
+
+usage: python benchmarks/startup.py [runs]
+'''
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = '''
+import time
+begin = time.perf_counter()
+import jsinterpreter
+imported = time.perf_counter()
+jsinterpreter.script_text('function f(x) { return x + "/path"; } location.href = f("http://host");')
+finished = time.perf_counter()
+print(imported - begin, finished - imported)
+'''
+
+
+def measure(runs):
+    imports, first_scripts = [], []
+    for i in range(runs):
+        output = subprocess.check_output([sys.executable, '-c', PROBE], cwd=ROOT)
+        import_time, script_time = [float(x) for x in output.split()]
+        imports.append(import_time)
+        first_scripts.append(script_time)
+    return imports, first_scripts
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    imports, first_scripts = measure(runs)
+    for name, values in [('import', imports), ('first script', first_scripts)]:
+        print('%-13s median %7.2f ms   min %7.2f ms' % (name, statistics.median(values) * 1000, min(values) * 1000))
+
+
+if __name__ == '__main__':
+    main()
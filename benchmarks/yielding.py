@@ -0,0 +1,83 @@
+'''
+Runs a script that spends its time inside nested function calls through
+run_async next to a ticker task, and fails when the event loop is blocked for
+longer than the limit, when cancelling the task does not stop the script or
+when the timeout does not fire.
+
+usage: python benchmarks/yielding.py [interpreter|compiled] [yield_every]
+'''
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jsinterpreter
+
+# one top level statement, all the work happens in the calls below it
+SCRIPT = 'function f(n) { if (n > 0) { f(n - 1); f(n - 1); } return 1; } f(14); location.href = "done";'
+
+# longest time the loop may go without running the ticker, in seconds
+BLOCKED_LIMIT = 0.05
+
+
+async def ticker(ticks):
+    while True:
+        ticks.append(time.monotonic())
+        await asyncio.sleep(0)
+
+
+async def check(engine, yield_every):
+    failed = 0
+    ticks = []
+    tick_task = asyncio.ensure_future(ticker(ticks))
+    begin = time.monotonic()
+    url = await jsinterpreter.run_async(SCRIPT, yield_every=yield_every, engine=engine)
+    end = time.monotonic()
+    run_time = end - begin
+    tick_task.cancel()
+    ticks = [begin] + ticks + [end]
+    blocked = max(later - earlier for earlier, later in zip(ticks, ticks[1:]))
+    print('run            %8.2f s    url %s' % (run_time, url))
+    print('ticks          %8d' % (len(ticks) - 2))
+    print('longest block  %8.2f ms' % (blocked * 1000))
+    if url != 'done' or blocked > BLOCKED_LIMIT:
+        failed += 1
+
+    task = asyncio.ensure_future(jsinterpreter.run_async(SCRIPT, yield_every=yield_every, engine=engine))
+    await asyncio.sleep(0.1)
+    begin = time.monotonic()
+    task.cancel()
+    try:
+        await task
+        print('cancel         not delivered, the script ran to the end')
+        failed += 1
+    except asyncio.CancelledError:
+        print('cancel         %8.2f ms' % ((time.monotonic() - begin) * 1000))
+
+    try:
+        await jsinterpreter.run_async(SCRIPT, yield_every=yield_every, timeout=0.1, engine=engine)
+        print('timeout        did not fire')
+        failed += 1
+    except TimeoutError:
+        print('timeout        fired')
+    return failed
+
+
+def main():
+    engine = sys.argv[1] if len(sys.argv) > 1 else 'interpreter'
+    yield_every = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    # every call has to execute, not replay memoized results
+    jsinterpreter.function_memo.enabled = False
+    jsinterpreter.result_cache.enabled = False
+    print('engine %s, yield every %d statements' % (engine, yield_every))
+    if asyncio.run(check(engine, yield_every)) > 0:
+        print('FAILED')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,20 @@
+'''
+Simple JavaScript interpreter used for web scrapper.
+
+Importing the package has no side effects: the program cache, the builtin
+globals and the command line are only set up when first used.
+'''
+from .compiler import COMPILE_CACHE_SIZE, CompiledInterpreter, Compiler, compiler
+from .hooks import CallPrinter, Hooks, JsonTracer, TracingInterpreter, add_hook, create_interpreter, remove_hook
+from .interpreter import ASYNC_YIELD_EVERY, Interpreter
+from .lexer import PARSER_VERSION, Lexer, ProgramCache, get_program_cache, lexer, set_program_cache
+from .memo import FunctionMemo, function_memo
+from .prescan import PreScanner, pre_scanner, prescan_counters
+from .regex import RegexUtils, regex_utils
+from .results import RESULT_CACHE_SIZE, ResultCache, result_cache
+from .runtime import (ForkedTable, GlobalSnapshot, HostInputs, create_global_variables_table,
+                      fork_global_variables_table, get_snapshot, run_async, run_script_file, run_scripts,
+                      script_text)
+from .stringarray import STRING_ARRAY_CACHE_SIZE, StringArrayFastPath, string_array_fast_path
+from .tokens import TokenUtils, token_utils
+from .cli import main
@@ -0,0 +1,37 @@
+from .hooks import CallPrinter, JsonTracer, add_hook
+from .runtime import run_script_file
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='jsinterpreter',
+                                     description='print the url a page redirects to by setting location.href')
+    parser.add_argument('filename', help='javascript or html file')
+    parser.add_argument('--prescan', action='store_true',
+                        help='run each <script> block separately, skipping those that cannot redirect')
+    parser.add_argument('--calls', action='store_true',
+                        help='print every call that returns a value (runs on the interpreter)')
+    parser.add_argument('--trace', metavar='FILE', help='write a JSON lines execution trace to FILE')
+    parser.add_argument('--dump', metavar='FILE', default='output.js',
+                        help='where to write the script text with tags removed (default: output.js)')
+    parser.add_argument('--engine', choices=['interpreter', 'compiled'], default='interpreter',
+                        help='evaluate with the tree walking interpreter or with compiled closures '
+                             '(--calls and --trace always use the interpreter)')
+    args = parser.parse_args(argv)
+
+    if args.calls:
+        add_hook(CallPrinter())
+    trace = None
+    if args.trace is not None:
+        trace = open(args.trace, 'w')
+        add_hook(JsonTracer(trace))
+    try:
+        url = run_script_file(args.filename, prescan=args.prescan, dump_file=args.dump,
+                              engine=args.engine)
+    finally:
+        if trace is not None:
+            trace.close()
+    print()
+    print('redirect url: %s' % url)
+    return 0
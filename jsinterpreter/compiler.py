@@ -0,0 +1,593 @@
+import collections
+import operator
+
+from . import tokens
+from .interpreter import Interpreter
+from .tokens import token_utils
+
+COMPILE_CACHE_SIZE = 512
+
+
+class CompileError(Exception):
+    # raised for constructs the compiler leaves to the interpreter
+    pass
+
+
+class Compiler:
+    # Compiles lexed statements into trees of Python closures taking the running
+    # interpreter. The grammar and the evaluation order mirror Interpreter.eval_*,
+    # and the closures go through the same tokens, variable tables and host calls,
+    # so compiled and interpreted statements can be mixed freely.
+
+    bool_operators = ['===', '!==', '==', '!=', '<=', '>=', '<', '>']
+
+    arithmetic = {'+': operator.add, '-': operator.sub, '*': operator.mul, '/': operator.truediv}
+
+    comparisons = {'==': operator.eq, '!=': operator.ne, '<=': operator.le, '>=': operator.ge,
+                   '<': operator.lt, '>': operator.gt}
+
+    def __init__(self, max_size=COMPILE_CACHE_SIZE):
+        self.max_size = max_size
+        # id(program) -> (program, {position: (statement, end) or None})
+        self.programs = collections.OrderedDict()
+        # function key -> compiled body or None
+        self.functions = collections.OrderedDict()
+        self.tokens = ()
+        self.position = 0
+
+    def current_token(self, offset=0):
+        if self.position + offset >= len(self.tokens):
+            return ('eof', '<EOF>', 0)
+        return self.tokens[self.position + offset]
+
+    def parse_keyword(self, keyword):
+        kind, value, line = self.current_token()
+        if value == keyword and (kind == 'punct' or kind == 'keyword'):
+            self.position += 1
+            return True
+        return False
+
+    def expect(self, keyword):
+        if not self.parse_keyword(keyword):
+            raise CompileError('expect %s' % keyword)
+
+    def parse_id(self):
+        kind, value, line = self.current_token()
+        if kind == 'id':
+            self.position += 1
+            return value
+        return None
+
+    def skip_condition(self):
+        balanced_bracket = 0
+        while True:
+            kind, value, line = self.current_token()
+            if kind == 'eof':
+                raise CompileError('expect )')
+            self.position += 1
+            if kind == 'punct' and value == '(':
+                balanced_bracket += 1
+            if kind == 'punct' and value == ')':
+                balanced_bracket -= 1
+                if balanced_bracket <= 0:
+                    return
+
+    def skip_one_statement(self):
+        # same extent as Interpreter.skip_one_statement
+        if self.parse_keyword('if'):
+            self.skip_condition()
+            self.skip_one_statement()
+            if self.parse_keyword('else'):
+                self.skip_one_statement()
+            return
+        if self.parse_keyword('{'):
+            balanced_bracket = 1
+            while balanced_bracket != 0:
+                kind, value, line = self.current_token()
+                if kind == 'eof':
+                    raise CompileError('expect statement block end }')
+                if kind == 'punct' and value == '{':
+                    balanced_bracket += 1
+                if kind == 'punct' and value == '}':
+                    balanced_bracket -= 1
+                self.position += 1
+            return
+        balanced_bracket = 0
+        while True:
+            kind, value, line = self.current_token()
+            if kind == 'eof':
+                return
+            if kind == 'punct':
+                if value == ';' and balanced_bracket == 0:
+                    self.position += 1
+                    return
+                if value == '}' and balanced_bracket == 0:
+                    return
+                if value in '([{':
+                    balanced_bracket += 1
+                if value in ')]}':
+                    balanced_bracket -= 1
+            self.position += 1
+
+    def parse_function(self):
+        backup = self.position
+        if self.parse_keyword('function'):
+            function_name = self.parse_id()
+            if function_name is None:
+                function_name = ''
+            self.expect('(')
+            args = []
+            if not self.parse_keyword(')'):
+                args.append(self.parse_id())
+                while self.parse_keyword(','):
+                    args.append(self.parse_id())
+                self.expect(')')
+            begin_position = self.position
+            self.skip_one_statement()
+            return function_name, tuple(args), self.tokens[begin_position: self.position]
+        self.position = backup
+        return None
+
+    # statements
+
+    def compile_statement(self):
+        line = self.current_token()[2]
+        body = self._compile_statement_body()
+
+        def statement(interpreter):
+            tokens.line_number = interpreter.line_number = line
+            if interpreter.run_state is not None:
+                interpreter.count_step()
+            return body(interpreter)
+        return statement
+
+    def _compile_statement_body(self):
+        if self.parse_keyword('return'):
+            return self._compile_return()
+        if self.parse_keyword('var'):
+            return self._compile_var()
+
+        function = self.parse_function()
+        if function is not None:
+            function_name, args, code = function
+
+            def function_statement(interpreter):
+                interpreter.global_variables_table[function_name] = token_utils.function_token(
+                    function_name, list(args), code)
+            return function_statement
+
+        if self.parse_keyword('{'):
+            return self._compile_block()
+        if self.parse_keyword('if'):
+            return self._compile_if()
+
+        begin_position = self.position
+        expression = self.compile_expression()
+        self.parse_keyword(';')
+        if expression is None:
+            if self.position == begin_position:
+                raise CompileError('no statement at %s' % str(self.current_token()[1]))
+            return lambda interpreter: None
+
+        def expression_statement(interpreter):
+            expression(interpreter)
+        return expression_statement
+
+    def _compile_return(self):
+        expression = self.compile_expression()
+
+        def return_statement(interpreter):
+            returned_value = None if expression is None else expression(interpreter)
+            if returned_value is None:
+                returned_value = token_utils.none_token()
+            interpreter.register_variable('returned_value', returned_value, [])
+            return True
+        return return_statement
+
+    def _compile_var(self):
+        declarations = []
+        has_next = True
+        while has_next:
+            variable_name = self.parse_id()
+            if variable_name is None:
+                raise CompileError('expect a variable name')
+            expression = None
+            if self.parse_keyword('='):
+                expression = self._required(self.compile_expression())
+            declarations.append((variable_name, expression))
+            has_next = self.parse_keyword(',')
+        self.parse_keyword(';')
+
+        def var_statement(interpreter):
+            for variable_name, expression in declarations:
+                interpreter.register_variable(variable_name, token_utils.none_token(), [])
+                if expression is not None:
+                    interpreter.register_variable(variable_name, expression(interpreter), [])
+        return var_statement
+
+    def _compile_block(self):
+        statements = []
+        while not self.parse_keyword('}'):
+            if self.current_token()[0] == 'eof':
+                raise CompileError('expect statement block end }')
+            statements.append(self.compile_statement())
+
+        def block(interpreter):
+            for statement in statements:
+                if statement(interpreter):
+                    return True
+        return block
+
+    def _compile_branch(self):
+        begin = self.position
+        self.skip_one_statement()
+        end = self.position
+        self.position = begin
+        statement = self.compile_statement()
+        self.position = end
+        return statement
+
+    def _compile_if(self):
+        condition = self._required(self.compile_element())
+        true_branch = self._compile_branch()
+        false_branch = self._compile_branch() if self.parse_keyword('else') else None
+
+        def if_statement(interpreter):
+            if token_utils.value(token_utils.convert_to_boolean(condition(interpreter))):
+                return true_branch(interpreter)
+            if false_branch is not None:
+                return false_branch(interpreter)
+        return if_statement
+
+    # expressions
+
+    def _required(self, expression):
+        if expression is None:
+            raise CompileError('Unexpected end of expression')
+        return expression
+
+    def _parents(self, names, last_name):
+        # parent list of a dotted variable, checked like Interpreter.eval_variable
+        if len(names) == 0:
+            return lambda interpreter: []
+
+        def parents(interpreter):
+            parent = interpreter.get_variable(names[0], [])
+            for name in names[1:] + [last_name]:
+                property_value = interpreter.get_variable(name, [parent])
+                if property_value is None:
+                    interpreter.dump_error_message(
+                        '%s has no propery called %s' % (parent, name))
+                if name is not last_name:
+                    parent = property_value
+            return [parent]
+        return parents
+
+    def compile_variable(self):
+        backup = self.position
+        variable_name = self.parse_id()
+        if variable_name is not None:
+            names = [variable_name]
+            while self.parse_keyword('.'):
+                property_name = self.parse_id()
+                if property_name is None:
+                    raise CompileError('expect a property name')
+                names.append(property_name)
+            return 'id', names[-1], self._parents(names[:-1], names[-1])
+        function = self.parse_function()
+        if function is not None:
+            return 'function', function, None
+        self.position = backup
+        return None
+
+    def compile_expression(self):
+        backup = self.position
+        target = self.compile_variable()
+        if target is not None and target[0] == 'id':
+            kind, variable_name, parents = target
+            if self.parse_keyword('='):
+                return self._compile_assignment(variable_name, parents, self._required(self.compile_expression()))
+            for operator_prefix in '+-*/':
+                if self.parse_keyword(operator_prefix + '='):
+                    return self._compile_compound_assignment(
+                        variable_name, parents, self._operation(operator_prefix),
+                        self._required(self.compile_expression()))
+
+        self.position = backup
+        left = self.compile_bool_expression()
+        if left is None:
+            return None
+        for logical_operator in ['&&', '||']:
+            if self.parse_keyword(logical_operator):
+                right = self._required(self.compile_bool_expression())
+                operation = self._operation(logical_operator)
+
+                def logical(interpreter):
+                    left_expression = token_utils.convert_to_boolean(left(interpreter))
+                    right_expression = token_utils.convert_to_boolean(right(interpreter))
+                    return operation(left_expression, right_expression)
+                return logical
+        return left
+
+    def _compile_assignment(self, variable_name, parents, expression):
+        def assignment(interpreter):
+            parent_list = parents(interpreter)
+            interpreter.register_variable(variable_name, expression(interpreter), parent_list)
+            return interpreter.get_variable(variable_name, parent_list)
+        return assignment
+
+    def _compile_compound_assignment(self, variable_name, parents, operation, expression):
+        def compound_assignment(interpreter):
+            parent_list = parents(interpreter)
+            variable_value = interpreter.get_variable(variable_name, parent_list)
+            result = operation(variable_value, expression(interpreter))
+            interpreter.register_variable(variable_name, result, parent_list)
+            return result
+        return compound_assignment
+
+    def _compile_binary(self, operators, compile_operand):
+        left = compile_operand()
+        if left is None:
+            return None
+        while True:
+            kind, value, line = self.current_token()
+            if kind != 'punct' or value not in operators:
+                return left
+            self.position += 1
+            right = self._required(compile_operand())
+            left = self._binary(left, right, self._operation(value))
+
+    def _binary(self, left, right, operation):
+        def binary(interpreter):
+            return operation(left(interpreter), right(interpreter))
+        return binary
+
+    def _operation(self, operator_value):
+        # Picks the operation once, at compile time. Each one checks the operand
+        # types itself; mixed or unsupported types go to TokenUtils.double_operator,
+        # which gives the interpreter's result or error.
+        operator_token = token_utils.operator_token(operator_value, 0, None)
+        type_of = token_utils.type
+        value_of = token_utils.value
+
+        def fallback(val_1, val_2):
+            return token_utils.double_operator(val_1, val_2, operator_token)
+
+        if operator_value == '+':
+            def add(val_1, val_2):
+                type_1 = type_of(val_1)
+                type_2 = type_of(val_2)
+                if type_1 == 'string' or type_2 == 'string':
+                    return token_utils.string_token(token_utils.to_js_string(val_1) + token_utils.to_js_string(val_2))
+                if type_1 == 'number' and type_2 == 'number':
+                    return token_utils.number_token(value_of(val_1) + value_of(val_2))
+                return fallback(val_1, val_2)
+            return add
+
+        if operator_value in self.arithmetic:
+            arithmetic = self.arithmetic[operator_value]
+
+            def number_operation(val_1, val_2):
+                if type_of(val_1) == 'number' and type_of(val_2) == 'number':
+                    return token_utils.number_token(arithmetic(value_of(val_1), value_of(val_2)))
+                return fallback(val_1, val_2)
+            return number_operation
+
+        if operator_value in ['===', '!==']:
+            negate = operator_value == '!=='
+
+            def strict_equal(val_1, val_2):
+                result = type_of(val_1) == type_of(val_2) and value_of(val_1) == value_of(val_2)
+                return token_utils.boolean_token(result != negate)
+            return strict_equal
+
+        if operator_value in self.comparisons:
+            comparison = self.comparisons[operator_value]
+
+            def compare(val_1, val_2):
+                if type_of(val_1) == type_of(val_2):
+                    return token_utils.boolean_token(comparison(value_of(val_1), value_of(val_2)))
+                # different types are an error, reported by double_operator
+                return fallback(val_1, val_2)
+            return compare
+
+        if operator_value in ['&&', '||']:
+            convert = token_utils.convert_to_boolean
+
+            if operator_value == '&&':
+                def logical_and(val_1, val_2):
+                    return token_utils.boolean_token(value_of(convert(val_1)) and value_of(convert(val_2)))
+                return logical_and
+
+            def logical_or(val_1, val_2):
+                return token_utils.boolean_token(value_of(convert(val_1)) or value_of(convert(val_2)))
+            return logical_or
+
+        return fallback
+
+    def compile_bool_expression(self):
+        return self._compile_binary(self.bool_operators, self.compile_bool_factor)
+
+    def compile_bool_factor(self):
+        return self._compile_binary(['+', '-'], self.compile_number_factor)
+
+    def compile_number_factor(self):
+        return self._compile_binary(['*', '/'], self.compile_element_suffix)
+
+    def compile_args(self):
+        if not self.parse_keyword('('):
+            return None
+        if self.parse_keyword(')'):
+            return []
+        args = [self._required(self.compile_expression())]
+        while self.parse_keyword(','):
+            args.append(self._required(self.compile_expression()))
+        self.expect(')')
+        return args
+
+    def compile_element_suffix(self):
+        element = self.compile_element()
+        if element is None:
+            return None
+        while True:
+            args = self.compile_args()
+            if args is not None:
+                element = self._call(element, args)
+                continue
+            if self.parse_keyword('['):
+                index = self._required(self.compile_expression())
+                self.expect(']')
+                element = self._index(element, index)
+                continue
+            if self.current_token()[:2] == ('punct', '.') and self.current_token(1)[0] == 'id':
+                element = self._property(element, self.current_token(1)[1])
+                self.position += 2
+                continue
+            return element
+
+    def _call(self, element, args):
+        def call(interpreter):
+            function = element(interpreter)
+            return interpreter.call_value(function, [arg(interpreter) for arg in args])
+        return call
+
+    def _index(self, element, index):
+        def index_value(interpreter):
+            target = element(interpreter)
+            return interpreter.index_value(target, index(interpreter))
+        return index_value
+
+    def _property(self, element, property_name):
+        def property_value(interpreter):
+            return interpreter.property_value(element(interpreter), property_name)
+        return property_value
+
+    def compile_element(self):
+        backup = self.position
+        args = self.compile_args()
+        if args is not None:
+            if len(args) == 0:
+                raise CompileError('recongnized a bracket, but nothing inside')
+            if len(args) == 1:
+                return args[0]
+
+            def sequence(interpreter):
+                for arg in args:
+                    value = arg(interpreter)
+                return value
+            return sequence
+
+        target = self.compile_variable()
+        if target is not None:
+            if target[0] == 'id':
+                return self._variable(target[1], target[2])
+            return self._function_expression(*target[1])
+
+        kind, value, line = self.current_token()
+        if kind == 'string':
+            self.position += 1
+            return lambda interpreter: token_utils.string_token(value)
+        if kind == 'regex':
+            self.position += 1
+            return lambda interpreter: token_utils.regex_token(value[0], value[1])
+        if kind == 'number':
+            self.position += 1
+            return lambda interpreter: token_utils.number_token(value)
+        if self.parse_keyword('-'):
+            operand = self._required(self.compile_element())
+
+            def negative(interpreter):
+                expr = operand(interpreter)
+                if token_utils.is_number(expr):
+                    return token_utils.number_token(-token_utils.value(expr))
+                interpreter.dump_error_message('Invalid negative symbol')
+            return negative
+        if self.parse_keyword('!'):
+            operand = self._required(self.compile_element())
+
+            def negation(interpreter):
+                b_result = token_utils.convert_to_boolean(operand(interpreter))
+                return token_utils.boolean_token(not token_utils.value(b_result))
+            return negation
+
+        self.position = backup
+        return None
+
+    def _variable(self, variable_name, parents):
+        def variable(interpreter):
+            token = interpreter.get_variable(variable_name, parents(interpreter))
+            if token is None:
+                interpreter.dump_error_message(
+                    'variable %s undefined while evaluating element, parent: %s' % (variable_name, token))
+            return token
+        return variable
+
+    def _function_expression(self, function_name, args, code):
+        def function_expression(interpreter):
+            token = token_utils.function_token(function_name, list(args), code)
+            token['parents'] = []
+            return token
+        return function_expression
+
+    # caches
+
+    def _compile(self, program, position):
+        self.tokens = program
+        self.position = position
+        try:
+            statement = self.compile_statement()
+        except CompileError:
+            return None
+        finally:
+            self.tokens = ()
+        return statement, self.position
+
+    def statement(self, program, position):
+        # (statement, end position) of a top level statement, None when unsupported
+        entry = self.programs.get(id(program))
+        if entry is None or entry[0] is not program:
+            entry = self.programs[id(program)] = (program, {})
+            if len(self.programs) > self.max_size:
+                self.programs.popitem(last=False)
+        else:
+            self.programs.move_to_end(id(program))
+        statements = entry[1]
+        if position not in statements:
+            statements[position] = self._compile(program, position)
+        return statements[position]
+
+    def function_body(self, function):
+        key = token_utils.function_key(function)
+        if key in self.functions:
+            self.functions.move_to_end(key)
+            return self.functions[key]
+        compiled = self._compile(function['code'], 0)
+        body = None if compiled is None else compiled[0]
+        self.functions[key] = body
+        if len(self.functions) > self.max_size:
+            self.functions.popitem(last=False)
+        return body
+
+
+compiler = Compiler()
+
+
+class CompiledInterpreter(Interpreter):
+    # runs compiled closures, statements the compiler rejects fall back to the
+    # interpreter one at a time
+
+    def step(self):
+        compiled = compiler.statement(self.tokens, self.position)
+        if compiled is None:
+            self.eval_statement()
+            return
+        statement, end = compiled
+        statement(self)
+        self.position = end
+
+    def run_function_body(self):
+        body = compiler.function_body(self.current_function)
+        if body is None:
+            self.eval_statement()
+            return
+        body(self)
@@ -0,0 +1,144 @@
+from .compiler import CompiledInterpreter
+from .interpreter import Interpreter
+from .tokens import token_utils
+
+
+class Hooks:
+    # Base class for execution hooks, override the events you need. Hooks only
+    # run under TracingInterpreter, which replaces Interpreter while any hook is
+    # registered, so untraced runs do not pay for them.
+
+    def on_statement(self, interpreter, line):
+        pass
+
+    def on_call(self, interpreter, function, args):
+        pass
+
+    def on_return(self, interpreter, function, args, result):
+        pass
+
+    def on_assign(self, interpreter, name, value, parents):
+        pass
+
+    def on_property_get(self, interpreter, name, owner, value):
+        pass
+
+
+class TracingInterpreter(Interpreter):
+
+    def __init__(self, block_name='base', current_function=None, hooks=()):
+        Interpreter.__init__(self, block_name, current_function)
+        self.hooks = hooks
+
+    def spawn(self, block_name, current_function):
+        interpreter = Interpreter.spawn(self, block_name, current_function)
+        interpreter.hooks = self.hooks
+        return interpreter
+
+    def eval_statement(self):
+        line = self.current_token()[2]
+        for hook in self.hooks:
+            hook.on_statement(self, line)
+        return Interpreter.eval_statement(self)
+
+    def eval_function_call(self, function, args):
+        for hook in self.hooks:
+            hook.on_call(self, function, args)
+        result = Interpreter.eval_function_call(self, function, args)
+        for hook in self.hooks:
+            hook.on_return(self, function, args, result)
+        return result
+
+    def register_variable(self, name, token, parents):
+        Interpreter.register_variable(self, name, token, parents)
+        for hook in self.hooks:
+            hook.on_assign(self, name, token, parents)
+
+    def get_variable(self, name, parents):
+        token = Interpreter.get_variable(self, name, parents)
+        if len(parents) > 0:
+            for hook in self.hooks:
+                hook.on_property_get(self, name, parents[-1], token)
+        return token
+
+
+class JsonTracer(Hooks):
+    # writes one JSON object per event to output
+
+    def __init__(self, output, statements=False):
+        # json is only needed once tracing is switched on
+        import json
+
+        self.dumps = json.dumps
+        self.output = output
+        self.statements = statements
+
+    def _value(self, value):
+        val_type = token_utils.type(value)
+        if val_type in ['string', 'number', 'boolean', 'none', 'array', 'regex']:
+            return token_utils.to_js_string(value)
+        return '[%s %s]' % (val_type, token_utils.value(value))
+
+    def _write(self, event, interpreter, **fields):
+        record = {'event': event, 'block': interpreter.block_name,
+                  'line': interpreter.current_token()[2]}
+        record.update(fields)
+        self.output.write(self.dumps(record) + '\n')
+
+    def on_statement(self, interpreter, line):
+        if self.statements:
+            self._write('statement', interpreter)
+
+    def on_call(self, interpreter, function, args):
+        self._write('call', interpreter, function=function.get('name'),
+                    args=[self._value(arg) for arg in args])
+
+    def on_return(self, interpreter, function, args, result):
+        self._write('return', interpreter, function=function.get('name'),
+                    value=self._value(result))
+
+    def on_assign(self, interpreter, name, value, parents):
+        target = [self._value(parent) for parent in parents] + [name]
+        self._write('assign', interpreter, name='.'.join(target), value=self._value(value))
+
+    def on_property_get(self, interpreter, name, owner, value):
+        self._write('get', interpreter, name=name, owner=self._value(owner),
+                    value=self._value(value))
+
+
+class CallPrinter(Hooks):
+    # prints every call returning a value, used by the command line
+
+    def on_return(self, interpreter, function, args, result):
+        if function.get('native') or token_utils.type(result) == 'none':
+            return
+        argument = ''
+        if len(args) > 0:
+            argument = '("%s"' % token_utils.value(args[0])
+            for i in range(len(args)):
+                argument += ', "%s"' % token_utils.value(args[i])
+        print('call %8s(%15s), return "%s"' % (function.get('name'), argument, token_utils.value(result)))
+
+
+registered_hooks = []
+
+
+def add_hook(hook):
+    registered_hooks.append(hook)
+
+
+def remove_hook(hook):
+    registered_hooks.remove(hook)
+
+
+def create_interpreter(hooks=None, engine='interpreter'):
+    # hooks always observe the interpreter, the compiled engine has no hook points
+    if hooks is None:
+        hooks = registered_hooks
+    if len(hooks) > 0:
+        return TracingInterpreter(hooks=tuple(hooks))
+    if engine == 'compiled':
+        return CompiledInterpreter()
+    if engine != 'interpreter':
+        raise ValueError('unknown engine %s' % engine)
+    return Interpreter()
@@ -0,0 +1,826 @@
+'''
+
+args:   (expression, expression, ..., expression)
+        ()
+
+expression:
+            variable = expression
+            variable += expression
+            variable -= expression
+            variable *= expression
+            variable /= expression
+            variable = variable
+
+            bool_expression && bool_expression
+            bool_expression || bool_expression
+            bool_expression
+
+bool_expression:
+            bool_factor == bool_factor
+            bool_factor != bool_factor
+            bool_factor <= bool_factor
+            bool_factor >= bool_factor
+            bool_factor < bool_factor
+            bool_factor > bool_factor
+            bool_factor
+
+bool_factor:
+            number_factor + number_factor
+            number_factor - number_factor
+
+number_factor:
+            element_suffix * element_suffix
+            element_suffix / element_suffix
+            element_suffix
+
+element:    (expression)
+            variable
+            string
+            number
+            - element
+            ! element
+
+element_suffix:
+            element(args)
+            element[expr]
+            element
+
+variable:   id.id
+            id
+'''
+import time
+
+from . import tokens
+from .lexer import Lexer, get_program_cache
+from .memo import function_memo
+from .regex import regex_utils
+from .stringarray import string_array_fast_path
+from .tokens import token_utils
+
+# statements evaluated between two yields to the event loop in run_async
+ASYNC_YIELD_EVERY = 200
+
+
+class ScriptCancelled(BaseException):
+    # unwinds a paused script whose run_async task was cancelled
+    pass
+
+
+class ScriptThread:
+    # Runs interpreter.run() on a worker thread that takes turns with the event
+    # loop. The evaluator is recursive, so the worker is where a script can stop
+    # in the middle of a call: count_step calls pause() every yield_every
+    # statements at any depth, and the worker waits there until the coroutine has
+    # let the loop run and hands the turn back. One side always waits for the
+    # other, so a script never runs alongside the loop or another script.
+
+    def __init__(self, interpreter):
+        import threading
+
+        self.interpreter = interpreter
+        self.resumed = threading.Semaphore(0)
+        self.paused = threading.Semaphore(0)
+        self.cancelled = False
+        self.finished = False
+        self.error = None
+        self.thread = threading.Thread(target=self._work, name='jsinterpreter %s' % interpreter.block_name,
+                                       daemon=True)
+
+    def _work(self):
+        self.resumed.acquire()
+        try:
+            if not self.cancelled:
+                self.interpreter.run()
+        except ScriptCancelled:
+            pass
+        except BaseException as error:
+            # TimeoutError, and SystemExit from error messages, reach the coroutine
+            self.error = error
+        finally:
+            self.finished = True
+            self.paused.release()
+
+    def _turn(self):
+        # lets the worker run until its next pause, blocking the loop meanwhile
+        self.resumed.release()
+        self.paused.acquire()
+
+    def pause(self):
+        # called by the worker, returns once the coroutine hands the turn back
+        self.paused.release()
+        self.resumed.acquire()
+        if self.cancelled:
+            raise ScriptCancelled()
+
+    async def run(self):
+        import asyncio
+
+        self.thread.start()
+        try:
+            self._turn()
+            while not self.finished:
+                await asyncio.sleep(0)
+                self._turn()
+        except BaseException:
+            # cancelled while paused: unwind the script before the task ends
+            if not self.finished:
+                self.cancelled = True
+                self._turn()
+            raise
+        finally:
+            self.thread.join()
+        error, self.error = self.error, None
+        if error is not None:
+            try:
+                raise error
+            finally:
+                error = None
+
+
+class Interpreter:
+
+    keyword_table = Lexer.keyword_table
+
+    def __init__(self, block_name='base', current_function=None):
+        self.tokens = ()
+        self.position = self.line_number = 0
+        self.variables_table = {}
+        self.global_variables_table = {}
+        self.block_name = block_name
+        self.current_function = current_function
+        # shared by nested interpreters while running under run_async
+        self.run_state = None
+        if current_function is None:
+            self.current_function = token_utils.none_token()
+            self.current_function['name'] = ''
+
+    def dump_error_message(self, message):
+        print('[Interpreter] Error: %s' % message)
+        print('In line %d' % self.current_token()[2])
+        self.dump_variable_table()
+        exit(0)
+
+    def dump_warning_message(self, message):
+        print('[Interpreter] Warning: %s' % message)
+        print('In line %d' % self.current_token()[2])
+        return
+
+    def current_token(self, offset=0):
+        if self.position + offset >= len(self.tokens):
+            return ('eof', '<EOF>', self.tokens[-1][2] if len(self.tokens) > 0 else 0)
+        return self.tokens[self.position + offset]
+
+    def current_val(self, offset=0):
+        return self.current_token(offset)[1]
+
+    def source(self, begin, end):
+        return ' '.join(str(token[1]) for token in self.tokens[begin: end])
+
+    def parse_keyword(self, keyword):
+        kind, value, line = self.current_token()
+        if value == keyword and (kind == 'punct' or kind == 'keyword'):
+            self.position += 1
+            return True
+        return False
+
+    def parse_keyword_id(self, keyword):
+        return self.parse_keyword(keyword)
+
+    def eval_string(self):
+        kind, value, line = self.current_token()
+        if kind == 'string':
+            self.position += 1
+            return token_utils.string_token(value)
+        if kind == 'regex':
+            self.position += 1
+            return token_utils.regex_token(value[0], value[1])
+        return None
+
+    def eval_number(self):
+        kind, value, line = self.current_token()
+        if kind == 'number':
+            self.position += 1
+            return token_utils.number_token(value)
+        return None
+
+    def parse_id(self):
+        kind, value, line = self.current_token()
+        if kind == 'id':
+            self.position += 1
+            return value
+        return None
+
+    def eval_basic_token(self):
+        token = self.eval_string()
+        if token is not None:
+            return token
+        token = self.eval_number()
+        if token is not None:
+            return token
+        token = self.parse_id()
+        if token is not None:
+            return token_utils.variable_token(token)
+        return None
+
+    def eval_variable(self):
+        # safe rollback
+
+        backup = self.position
+
+        next_token = self.parse_id()
+
+        if next_token is not None:
+            parent_s = []
+            next_token = token_utils.variable_token(next_token)
+
+            has_next = self.parse_keyword('.')
+
+            if has_next:
+                if token_utils.type(next_token) == 'id':
+                    parent = self.get_variable(token_utils.value(next_token), [])
+                else:
+                    parent = next_token
+
+            if token_utils.type(next_token) == 'id' or has_next:
+            
+                while has_next:
+                    if token_utils.type(next_token) == 'id':
+                        next_token = self.get_variable(token_utils.value(next_token), parent_s)
+                    parent_s.append(next_token)
+                    next_token = token_utils.variable_token(self.parse_id())
+                    property_value = parent.get(token_utils.value(next_token))
+                    if property_value is None:
+                        property_value = token_utils.native_method(parent, token_utils.value(next_token))
+                    if property_value is None:
+                        self.dump_error_message(
+                            '%s has no propery called %s' % (parent_s.pop(), token_utils.value(next_token)))
+                    parent = property_value
+
+
+                    has_next = self.parse_keyword('.')
+
+                next_token['parents'] = parent_s
+
+                
+                return next_token
+
+
+
+        self.position = backup
+
+        token = self.parse_function()
+        if token is not None:
+            token['parents'] = []
+            return token
+
+        self.position = backup
+
+        return None
+
+    def eval_args(self):
+        if self.parse_keyword('('):
+            last_arg_position = self.position
+            args = []
+            if self.parse_keyword(')'):
+                return args
+            args.append(self.eval_expression())
+            while self.parse_keyword(','):
+                args.append(self.eval_expression())
+            if not self.parse_keyword(')'):
+                print('while parsing args in %s' %
+                      self.source(last_arg_position, self.position))
+                self.dump_error_message('Expect ) while evalulating args')
+            return args
+        return None
+
+    def parse_function(self):
+
+        backup = self.position
+        if self.parse_keyword_id('function'):
+            function_name = self.parse_id()
+            if function_name is None:
+                function_name = ''
+            if self.parse_keyword('('):
+                args = []
+                if not self.parse_keyword(')'):
+                    args.append(self.parse_id())
+                    while self.parse_keyword(','):
+                        args.append(self.parse_id())
+
+                    if not self.parse_keyword(')'):
+                        self.dump_error_message(
+                            'right bracket expect, but found %s' % self.current_val())
+            begin_position = self.position
+            self.skip_one_statement()
+
+            end_position = self.position
+            return token_utils.function_token(function_name, args, self.tokens[begin_position: end_position])
+
+        # safe rollback
+        self.position = backup
+        return None
+
+    def eval_element(self):
+        backup = self.position
+        token = self.eval_args()
+        if token is not None:
+            if len(token) > 0:
+                return token.pop()
+            self.dump_error_message(
+                'recongnized a bracket, but nothing inside')
+
+        token = self.eval_variable()
+        if token is not None:
+            if token_utils.type(token) == 'id':
+                variable_name = token_utils.value(token)
+                parents = token['parents']
+                token = self.get_variable(variable_name, parents)
+                if token is None:
+                    self.dump_error_message(
+                        'variable %s undefined while evaluating element, parent: %s' % (variable_name, token))
+            return token
+
+        token = self.eval_string()
+        if token is not None:
+            return token
+        token = self.eval_number()
+        if token is not None:
+            return token
+        if self.parse_keyword('-'):
+            expr = self.eval_element()
+            if token_utils.is_number(expr):
+                # a new token, the operand may be bound to a variable
+                return token_utils.number_token(-token_utils.value(expr))
+            self.dump_error_message('Invalid negative symbol')
+        if self.parse_keyword('!'):
+            expr = self.eval_element()
+            b_result = token_utils.convert_to_boolean(expr)
+            return token_utils.boolean_token(not token_utils.value(b_result))
+
+        self.position = backup
+        return None
+
+    def _find_variable_in_table(self, parents, table):
+        parent = table
+        for next_token in parents:
+            if token_utils.type(next_token) == 'id':
+                if parent.get(token_utils.value(next_token)) is None:
+                    return None
+                parent = parent.get(token_utils.value(next_token))
+            else:
+                parent = next_token
+        return parent
+
+    def register_variable(self, name, token, parents):
+        parent = self._find_variable_in_table(
+                parents, self.variables_table)
+        if parent is None:
+            parent = self._find_variable_in_table(parents, self.global_variables_table)
+
+        if parent is None:
+            self.dump_error_message(
+                'object location %s does not exist' % ('->'.join(parents)))
+
+        parent[name] = token
+
+
+    def get_variable(self, name, parents):
+
+        if len(parents) > 0:
+
+            parent = self._find_variable_in_table(parents, self.variables_table)
+            if parent is None:
+                parent = self._find_variable_in_table(parents, self.global_variables_table)
+
+            token = parent.get(token_utils.value(name))
+            if token_utils.type(token) == 'id':
+                # stored method stubs are shared, bind a fresh copy to the owner
+                token = dict(token)
+                token['self'] = parent
+            if token is None:
+                token = token_utils.native_method(parent, token_utils.value(name))
+
+            return token
+
+        token = self.variables_table.get(name)
+
+        if token is None:
+            token = self.global_variables_table.get(name)
+
+        if token is None:
+            self.dump_error_message("%s undefined @!!" % name)
+
+        return token
+
+    def eval_function_call(self, function, args):
+        if len(function['args']) < len(args) and not function.get('native'):
+            self.dump_error_message(
+                'too much arguments for function %s' % function['name'])
+
+        function_name = function.get('name')
+
+        if function_name == 'alert':
+            args = [token_utils.to_js_string(x) for x in args]
+            if len(args) == 0:
+                print()
+            elif len(args) == 1:
+                print(args.pop())
+            else:
+                print(args)
+            return token_utils.none_token()
+        if function_name == 'toString':
+            return token_utils.convert_to_string(function.get('self'))
+        if 'string_table' in function:
+            return string_array_fast_path.call(function, args)
+        if function.get('native'):
+            return regex_utils.call(self, function_name, function.get('self'), args)
+
+        return function_memo.call(self, function, args,
+                                  lambda: self.eval_user_function(function, args))
+
+    def eval_user_function(self, function, args):
+        function_name = function.get('name')
+
+        interpreter = self.spawn(str(function_name), function)
+
+        function_variables_table = self.variables_table.copy()
+        function_variables_table['returned_value'] = token_utils.none_token()
+
+        for i in range(min(len(function['args']), len(args))):
+            function_variables_table[function['args'][i]] = args[i]
+
+        try:
+            interpreter.load(function['code'], variables_table=function_variables_table,
+                             global_variables_table=self.global_variables_table)
+
+            interpreter.run_function_body()
+
+            return interpreter.get_variable('returned_value', [])
+        finally:
+            interpreter.close()
+
+    def eval_bool_expression(self):
+        token = self.eval_bool_factor()
+        can_continue = True
+        if token is not None:
+            while can_continue:
+                can_continue = False
+                for operator_prefix in ['===', '!==', '==', '!=', '<=', '>=', '<', '>']:
+                    if self.parse_keyword(operator_prefix):
+                        left_expression = token
+                        right_expression = self.eval_bool_factor()
+                        if right_expression is None:
+                            self.dump_error_message(
+                                'Unexpected end of expression')
+                        operator = token_utils.operator_token(
+                            operator_prefix, 0, None)
+                        token = token_utils.double_operator(
+                            left_expression, right_expression, operator)
+                        can_continue = True
+            return token
+        return None
+
+    def eval_bool_factor(self):
+        token = self.eval_number_factor()
+        can_continue = True
+        if token is not None:
+            while can_continue:
+                can_continue = False
+                for operator_prefix in '+-':
+                    if self.parse_keyword(operator_prefix):
+                        left_expression = token
+                        right_expression = self.eval_number_factor()
+                        if right_expression is None:
+                            self.dump_error_message(
+                                'Unexpected end of expression')
+                        operator = token_utils.operator_token(
+                            operator_prefix, 0, None)
+                        token = token_utils.double_operator(
+                            left_expression, right_expression, operator)
+                        can_continue = True
+
+            return token
+        return None
+
+    def call_value(self, token, args):
+        # this is a function, feature: variable ()
+        if token_utils.type(token) == 'function_def':
+            return self.eval_function_call(token, args)
+        if token_utils.type(token) == 'id':
+            function = token_utils.method_token(
+                token_utils.value(token), token.get('self'))
+            return self.eval_function_call(function, args)
+        self.dump_error_message('%s is not a function' % token_utils.value(token))
+
+    def index_value(self, token, expr):
+        if token_utils.is_string(expr):
+            return self.property_value(token, token_utils.value(expr))
+        if not token_utils.is_number(expr):
+            self.dump_error_message('Index must be integer')
+        index = int(token_utils.value(expr))
+        target = token_utils.value(token)
+        if not token_utils.is_string(token) and token_utils.type(token) != 'array':
+            self.dump_error_message('%s cannot be indexed' % target)
+        if 0 <= index < len(target):
+            if token_utils.is_string(token):
+                return token_utils.string_token(target[index])
+            return target[index]
+        return token_utils.none_token()
+
+    def property_value(self, token, name):
+        property_value = self.get_variable(name, [token])
+        if property_value is None:
+            property_value = token_utils.none_token()
+        return property_value
+
+    def eval_element_suffix(self):
+
+        token = self.eval_element()
+        while token is not None:
+            args = self.eval_args()
+            if args is not None:
+                token = self.call_value(token, args)
+                continue
+
+            if self.parse_keyword('['):
+                expr = self.eval_expression()
+                if not self.parse_keyword(']'):
+                    self.dump_error_message('Expect end symbol of index ]')
+                token = self.index_value(token, expr)
+                continue
+
+            backup = self.position
+            if self.parse_keyword('.'):
+                property_name = self.parse_id()
+                if property_name is not None:
+                    token = self.property_value(token, property_name)
+                    continue
+            self.position = backup
+            return token
+
+    # TAG*/
+    def eval_number_factor(self):
+        token = self.eval_element_suffix()
+        can_continue = True
+        if token is not None:
+            while can_continue:
+                can_continue = False
+                for operator_prefix in '*/':
+                    if self.parse_keyword(operator_prefix):
+                        left_expression = token
+                        right_expression = self.eval_element_suffix()
+                        if right_expression is None:
+                            self.dump_error_message(
+                                'Unexpected end of expression')
+                        operator = token_utils.operator_token(
+                            operator_prefix, 0, None)
+                        token = token_utils.double_operator(
+                            left_expression, right_expression, operator)
+                        can_continue = True
+            return token
+
+        return None
+
+    def eval_expression(self):
+        # eval expression only if we are sure there exists an expression
+        backup = self.position
+        token = self.eval_variable()
+        if token is not None and token_utils.type(token) == 'id':
+            variable_name = token_utils.value(token)
+            
+            if self.parse_keyword('='):
+                self.register_variable(
+                    variable_name, self.eval_expression(), token['parents'])
+                return self.get_variable(variable_name, token['parents'])
+            variable_value = self.get_variable(variable_name, token['parents'])
+            if variable_value is not None:
+                for operator_prefix in '+-*/':
+                    operator = operator_prefix + '='
+                    if self.parse_keyword(operator):
+                        operator = token_utils.operator_token(
+                            operator_prefix, 0, None)
+                        left_expression = variable_value
+                        right_expression = self.eval_expression()
+                        result = token_utils.double_operator(left_expression, right_expression, operator)
+                        self.register_variable(variable_name, result, token['parents'])
+                        return result
+
+        # safe rollback, since not call any function by just parsing a variable
+        self.position = backup
+        token = self.eval_bool_expression()
+        if token is not None:
+            for operator in ['&&', '||']:
+                if self.parse_keyword(operator):
+                    right = self.eval_bool_expression()
+                    if right is None:
+                        self.dump_error_message(
+                            'Unexpected end symbol of expression')
+
+                    left_expression = token_utils.convert_to_boolean(token)
+                    right_expression = token_utils.convert_to_boolean(right)
+                    operator = token_utils.operator_token(operator, 0, None)
+                    return token_utils.double_operator(left_expression, right_expression, operator)
+            return token
+        return None
+
+    def skip_condition(self):
+        # skips a bracketed if condition
+        balanced_bracket = 0
+        while True:
+            kind, value, line = self.current_token()
+            if kind == 'eof':
+                return
+            self.position += 1
+            if kind == 'punct' and value == '(':
+                balanced_bracket += 1
+            if kind == 'punct' and value == ')':
+                balanced_bracket -= 1
+                if balanced_bracket <= 0:
+                    return
+
+    def skip_one_statement(self):
+
+        if self.parse_keyword_id('if'):
+            # an if statement spans its condition, its branch and an optional else branch
+            self.skip_condition()
+            self.skip_one_statement()
+            if self.parse_keyword_id('else'):
+                self.skip_one_statement()
+            return
+
+        if self.parse_keyword('{'):
+            balanced_bracket = 1
+
+            while balanced_bracket != 0:
+                kind, value, line = self.current_token()
+                if kind == 'eof':
+                    self.dump_error_message('expect statement block end }')
+                if kind == 'punct' and value == '{':
+                    balanced_bracket += 1
+                if kind == 'punct' and value == '}':
+                    balanced_bracket -= 1
+                self.position += 1
+        else:
+            balanced_bracket = 0
+            while True:
+                kind, value, line = self.current_token()
+                if kind == 'eof':
+                    return
+                if kind == 'punct':
+                    if value == ';' and balanced_bracket == 0:
+                        self.position += 1
+                        return
+                    if value == '}' and balanced_bracket == 0:
+                        # the statement ends with its enclosing block
+                        return
+                    if value in '([{':
+                        balanced_bracket += 1
+                    if value in ')]}':
+                        balanced_bracket -= 1
+                self.position += 1
+
+    def spawn(self, block_name, current_function):
+        # interpreter evaluating a function body on behalf of this one
+        interpreter = self.__class__(block_name=block_name, current_function=current_function)
+        interpreter.run_state = self.run_state
+        return interpreter
+
+    def count_step(self):
+        run_state = self.run_state
+        run_state['steps'] += 1
+        if run_state['deadline'] is not None and time.monotonic() > run_state['deadline']:
+            raise TimeoutError('script exceeded its time limit in %s' % self.block_name)
+        if run_state['steps'] % run_state['yield_every'] == 0:
+            run_state['pause']()
+
+    def eval_branch(self):
+        begin = self.position
+        self.skip_one_statement()
+        end = self.position
+        self.position = begin
+        if self.eval_statement():
+            return True
+        self.position = end
+
+    def eval_statement(self):
+
+        if self.run_state is not None:
+            self.count_step()
+        backup = self.position
+        self.line_number = self.current_token()[2]
+        tokens.line_number = self.line_number
+
+        if self.parse_keyword_id('return'):
+            returned_value = self.eval_expression()
+            if returned_value is None:
+                returned_value = token_utils.none_token()
+            self.register_variable('returned_value', returned_value, [])
+            return True
+
+        self.position = backup
+
+        if self.parse_keyword_id('var'):
+            has_next = True
+            while has_next:
+                variable_name = self.parse_id()
+                self.register_variable(
+                    variable_name, token_utils.none_token(), [])
+                if self.parse_keyword('='):
+                    self.register_variable(
+                        variable_name, self.eval_expression(), [])
+                has_next = self.parse_keyword(',')
+            self.parse_keyword(';')
+            return
+
+        self.position = backup
+
+        token = self.parse_function()
+        if token is not None:
+            self.global_variables_table[token['name']] = token
+            return
+
+        last_position = -1
+        if self.parse_keyword('{'):
+            while not self.parse_keyword('}'):
+                if last_position == self.position:
+                    print(self.current_val())
+                    self.dump_error_message('infinite loop found')
+                last_position = self.position
+                if self.eval_statement():
+                    return True
+            return
+
+        if self.parse_keyword_id('if'):
+            expr = token_utils.convert_to_boolean(self.eval_element())
+            # a branch always ends where skip_one_statement would leave it
+            if token_utils.value(expr):
+                if self.eval_branch():
+                    return True
+                if self.parse_keyword_id('else'):
+                    self.skip_one_statement()
+                return
+            self.skip_one_statement()
+            if self.parse_keyword_id('else'):
+                return self.eval_branch()
+            return
+
+        self.eval_expression()
+        self.parse_keyword(';')
+        return
+
+    def is_completed(self):
+        return self.position >= len(self.tokens)
+
+    def dump_variable_table(self):
+        if len(self.block_name) > 0:
+            print('Variable table for %s' % self.block_name)
+        else:
+            print('Variable table')
+        for key in self.variables_table:
+            print('"%s":\t%s' % (key, self.variables_table[key]))
+
+    def load(self, script_text, variables_table={}, global_variables_table={}):
+        if isinstance(script_text, str):
+            script_text = get_program_cache().parse(script_text)
+        self.tokens = script_text
+        self.position = self.line_number = 0
+        self.variables_table = variables_table.copy()
+        self.global_variables_table = global_variables_table
+
+    def close(self):
+        # drops the per-run state, nothing a run created outlives it
+        self.tokens = ()
+        self.variables_table = {}
+        self.global_variables_table = {}
+        self.current_function = None
+        self.run_state = None
+
+    def step(self):
+        # evaluates one top level statement
+        self.eval_statement()
+
+    def run_function_body(self):
+        self.eval_statement()
+
+    def run(self):
+        string_array_fast_path.apply(self)
+        last_position = -1
+        while not self.is_completed():
+            if last_position == self.position:
+                self.dump_error_message('find infinite loop')
+            last_position = self.position
+            self.step()
+
+        return
+
+    async def run_async(self, yield_every=ASYNC_YIELD_EVERY, timeout=None):
+        # the script runs on a ScriptThread, which gives control back to the event
+        # loop every yield_every statements, inside function calls as well
+        deadline = None if timeout is None else time.monotonic() + timeout
+        script = ScriptThread(self)
+        self.run_state = {'steps': 0, 'deadline': deadline, 'yield_every': max(1, yield_every),
+                          'pause': script.pause}
+        try:
+            await script.run()
+        finally:
+            self.run_state = None
@@ -0,0 +1,338 @@
+import collections
+import hashlib
+import marshal
+import os
+import sys
+
+# bump whenever the layout of lexed programs changes, it invalidates cached programs
+PARSER_VERSION = 1
+
+PROGRAM_CACHE_SIZE = 512
+PROGRAM_CACHE_DISK_SIZE = 64 * 1024 * 1024
+# stores between two scans of the cache directory, other workers' files are
+# only seen by a scan
+PROGRAM_CACHE_SCAN_EVERY = 256
+
+
+class Lexer:
+
+    keyword_table = ['function', 'var', 'if', 'while', 'else', 'return']
+
+    punctuators = ['===', '!==', '==', '!=', '<=', '>=', '&&', '||',
+                   '+=', '-=', '*=', '/=', '++', '--']
+
+    hex_digits = '0123456789abcdefABCDEF'
+
+    digits = '0123456789'
+
+    escapes = {'n': '\n', 't': '\t', 'r': '\r', 'b': '\b', 'f': '\f', 'v': '\v', '0': '\0'}
+
+    def _dump_error_message(self, message, line):
+        print('[LEXER] Error: %s' % message)
+        print('In line %d' % line)
+        exit(0)
+
+    def _is_id_symbol(self, value):
+        return value.isalnum() or value in '_$'
+
+    def _regex_allowed(self, tokens):
+        # a / starts a regex literal unless it follows an operand
+        if len(tokens) == 0:
+            return True
+        kind, value, line = tokens[-1]
+        if kind == 'punct':
+            return value not in [')', ']']
+        return kind == 'keyword'
+
+    def _hex_char(self, digits, length, line):
+        # the character of a \x or \u escape, length is None for \u{...}
+        if len(digits) == 0 or (length is not None and len(digits) != length) \
+                or any(digit not in self.hex_digits for digit in digits) or int(digits, 16) > 0x10ffff:
+            self._dump_error_message('invalid escape sequence in string', line)
+        return chr(int(digits, 16))
+
+    def _read_string(self, text, position, line):
+        quote = text[position]
+        position += 1
+        chars = []
+        while position < len(text) and text[position] != quote:
+            char = text[position]
+            if char in '\r\n':
+                self._dump_error_message('expect %s while parsing string' % quote, line)
+            if char == '\\' and position + 1 < len(text):
+                position += 1
+                char = text[position]
+                if char == 'x':
+                    chars.append(self._hex_char(text[position + 1: position + 3], 2, line))
+                    position += 2
+                elif char == 'u' and text[position + 1: position + 2] == '{':
+                    end = text.find('}', position)
+                    if end == -1:
+                        self._dump_error_message('invalid escape sequence in string', line)
+                    chars.append(self._hex_char(text[position + 2: end], None, line))
+                    position = end
+                elif char == 'u':
+                    chars.append(self._hex_char(text[position + 1: position + 5], 4, line))
+                    position += 4
+                elif char == '\r' or char == '\n':
+                    # line continuation
+                    line += 1
+                    if text[position: position + 2] == '\r\n':
+                        position += 1
+                else:
+                    chars.append(self.escapes.get(char, char))
+            else:
+                chars.append(char)
+            position += 1
+        if position >= len(text):
+            self._dump_error_message('expect %s while parsing string' % quote, line)
+        return ''.join(chars), position + 1, line
+
+    def _read_regex(self, text, position, line):
+        begin = position = position + 1
+        in_class = is_shift = False
+        while position < len(text) and (text[position] != '/' or in_class or is_shift):
+            char = text[position]
+            if char == '\n':
+                break
+            if not is_shift and char == '[':
+                in_class = True
+            if not is_shift and char == ']':
+                in_class = False
+            is_shift = not is_shift and char == '\\'
+            position += 1
+        if position >= len(text) or text[position] != '/':
+            self._dump_error_message('Expect the end symbol /', line)
+        pattern = text[begin: position]
+        position = flags_begin = position + 1
+        while position < len(text) and self._is_id_symbol(text[position]):
+            position += 1
+        return (pattern, text[flags_begin: position]), position
+
+    def _read_number(self, text, position, line):
+        begin = position
+        if text[position: position + 2] in ['0x', '0X']:
+            position += 2
+            while position < len(text) and text[position] in self.hex_digits:
+                position += 1
+            if position == begin + 2:
+                self._dump_error_message('expect hexadecimal digits', line)
+            return float(int(text[begin + 2: position], 16)), position
+        is_float = False
+        while position < len(text) and (text[position] in self.digits or text[position] == '.'):
+            if text[position] == '.':
+                if is_float:
+                    break
+                is_float = True
+            position += 1
+        if position < len(text) and text[position] in 'eE':
+            exponent = position + 1
+            if exponent < len(text) and text[exponent] in '+-':
+                exponent += 1
+            if exponent < len(text) and text[exponent] in self.digits:
+                position = exponent
+                while position < len(text) and text[position] in self.digits:
+                    position += 1
+        return float(text[begin: position]), position
+
+    def tokenize(self, text):
+        tokens = []
+        position = line = 0
+        while position < len(text):
+            char = text[position]
+            if char in ' \t\r\f\v\ufeff\xa0':
+                position += 1
+            elif char == '\n':
+                line += 1
+                position += 1
+            elif text.startswith('//', position):
+                position = text.find('\n', position)
+                if position == -1:
+                    position = len(text)
+            elif text.startswith('/*', position):
+                end = text.find('*/', position + 2)
+                if end == -1:
+                    self._dump_error_message('expect the end symbol of comments', line)
+                line += text.count('\n', position, end)
+                position = end + 2
+            elif char in '"\'':
+                value, position, next_line = self._read_string(text, position, line)
+                tokens.append(('string', value, line))
+                line = next_line
+            elif char in self.digits or (char == '.' and text[position + 1: position + 2] in self.digits
+                                         and position + 1 < len(text)):
+                value, position = self._read_number(text, position, line)
+                tokens.append(('number', value, line))
+            elif self._is_id_symbol(char):
+                begin = position
+                while position < len(text) and self._is_id_symbol(text[position]):
+                    position += 1
+                value = text[begin: position]
+                tokens.append(('keyword' if value in self.keyword_table else 'id', value, line))
+            elif char == '/' and self._regex_allowed(tokens):
+                value, position = self._read_regex(text, position, line)
+                tokens.append(('regex', value, line))
+            else:
+                for punctuator in self.punctuators:
+                    if text.startswith(punctuator, position):
+                        char = punctuator
+                        break
+                tokens.append(('punct', char, line))
+                position += len(char)
+        return tuple(tokens)
+
+
+lexer = Lexer()
+
+
+class ProgramCache:
+    # Lexed programs keyed by source hash. Lookups go through a bounded in-memory
+    # table first and then, when a directory is configured, through marshal files
+    # shared by every worker process. Files are written to a temporary name and
+    # renamed, so concurrent readers never see a partial entry. The directory size
+    # is tracked from this worker's stores and rescanned now and then.
+
+    token_types = {'id': str, 'keyword': str, 'punct': str, 'string': str, 'number': float, 'regex': tuple}
+
+    def __init__(self, directory=None, max_size=PROGRAM_CACHE_SIZE, max_disk_size=PROGRAM_CACHE_DISK_SIZE):
+        self.directory = directory
+        self.max_size = max_size
+        self.max_disk_size = max_disk_size
+        self.programs = collections.OrderedDict()
+        self.hits = self.disk_hits = self.misses = 0
+        self.disk_size = None
+        self.stores = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def key(self, script_text):
+        digest = hashlib.sha1(script_text.encode('utf-8', 'surrogatepass')).hexdigest()
+        return '%s-%d-py%d%d' % ((digest, PARSER_VERSION) + tuple(sys.version_info[:2]))
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.marshal')
+
+    def _load(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as cached:
+                program = marshal.load(cached)
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError, ValueError, TypeError):
+            # a damaged entry is dropped and parsed again
+            self._remove(path)
+            return None
+        if not self._is_program(program):
+            self._remove(path)
+            return None
+        return program
+
+    def _is_program(self, program):
+        # marshal restores any value, so check every token before the interpreter sees it
+        if not isinstance(program, tuple):
+            return False
+        for token in program:
+            if not isinstance(token, tuple) or len(token) != 3:
+                return False
+            kind, value, line = token
+            if not isinstance(value, self.token_types.get(kind, ())) or not isinstance(line, int):
+                return False
+            if kind == 'regex' and not (len(value) == 2 and isinstance(value[0], str) and isinstance(value[1], str)):
+                return False
+        return True
+
+    def _store(self, key, program):
+        import tempfile
+
+        handle, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(handle, 'wb') as output:
+                marshal.dump(program, output)
+                size = output.tell()
+            os.replace(temp_path, self._path(key))
+        except OSError:
+            self._remove(temp_path)
+            return
+        self.stores += 1
+        if self.disk_size is None or self.stores % PROGRAM_CACHE_SCAN_EVERY == 0:
+            self._evict()
+            return
+        self.disk_size += size
+        if self.disk_size > self.max_disk_size:
+            self._evict()
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _evict(self):
+        entries = []
+        total_size = 0
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith('.marshal'):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total_size += stat.st_size
+        if total_size > self.max_disk_size:
+            # least recently used entries go first, hits refresh the modification time
+            entries.sort()
+            for mtime, size, path in entries:
+                if total_size <= self.max_disk_size:
+                    break
+                self._remove(path)
+                total_size -= size
+        self.disk_size = total_size
+
+    def parse(self, script_text):
+        key = self.key(script_text)
+        program = self.programs.get(key)
+        if program is not None:
+            self.programs.move_to_end(key)
+            self.hits += 1
+            return program
+        if self.directory is not None:
+            program = self._load(key)
+            if program is not None:
+                self.disk_hits += 1
+        if program is None:
+            self.misses += 1
+            program = lexer.tokenize(script_text)
+            if self.directory is not None:
+                self._store(key, program)
+        self.programs[key] = program
+        if len(self.programs) > self.max_size:
+            self.programs.popitem(last=False)
+        return program
+
+    def clear(self):
+        self.programs.clear()
+        if self.directory is not None:
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith('.marshal'):
+                    self._remove(entry.path)
+            self.disk_size = 0
+
+
+program_cache = None
+
+
+def get_program_cache():
+    # created on first use so that importing the package touches no files
+    global program_cache
+    if program_cache is None:
+        program_cache = ProgramCache(os.environ.get('JSINTERPRETER_CACHE_DIR'))
+    return program_cache
+
+
+def set_program_cache(directory=None, max_size=PROGRAM_CACHE_SIZE, max_disk_size=PROGRAM_CACHE_DISK_SIZE):
+    global program_cache
+    program_cache = ProgramCache(directory, max_size, max_disk_size)
+    return program_cache
@@ -0,0 +1,216 @@
+import collections
+
+from .tokens import token_utils
+
+MEMO_SIZE = 256
+MEMO_FUNCTIONS = 1024
+
+
+class FunctionMemo:
+    # Memoizes calls of functions without effects: bodies that only assign their
+    # own arguments and vars, call nothing but such functions and natives, and are
+    # called with primitive arguments. Results are keyed by the code of the
+    # function and of every function it can reach, and by the values of the
+    # outer names they read, builtins included.
+
+    primitive_types = ['string', 'number', 'boolean', 'none']
+
+    assign_operators = ['=', '+=', '-=', '*=', '/=', '++', '--']
+
+    # functions dispatched by name that reach the host
+    effect_functions = ['alert']
+
+    def __init__(self, enabled=True, max_size=MEMO_SIZE, max_functions=MEMO_FUNCTIONS):
+        self.enabled = enabled
+        self.max_size = max_size
+        self.max_functions = max_functions
+        self.analysis = {}
+        self.results = collections.OrderedDict()
+        self.hits = self.misses = self.skipped = 0
+
+    def _var_statements(self, code):
+        # (position of var, declared names with their positions) for every var statement
+        statements = []
+        for position in range(len(code)):
+            if code[position][:2] != ('keyword', 'var'):
+                continue
+            names = []
+            expect_name = True
+            balanced_bracket = 0
+            for name_position in range(position + 1, len(code)):
+                kind, value, line = code[name_position]
+                if expect_name and kind == 'id':
+                    names.append((value, name_position))
+                expect_name = False
+                if kind == 'keyword' or (kind == 'punct' and value == ';' and balanced_bracket == 0):
+                    break
+                if kind == 'punct' and value in '([{':
+                    balanced_bracket += 1
+                if kind == 'punct' and value in ')]}':
+                    balanced_bracket -= 1
+                    if balanced_bracket < 0:
+                        break
+                if kind == 'punct' and value == ',' and balanced_bracket == 0:
+                    expect_name = True
+            statements.append((position, names))
+        return statements
+
+    def _top_level_positions(self, code):
+        # positions of statements that always run: directly in the body, after
+        # its opening bracket, a ; or a closed block
+        positions = set()
+        depth = 0
+        for position, (kind, value, line) in enumerate(code):
+            if kind != 'punct':
+                continue
+            if value in '([{':
+                depth += 1
+                if value == '{' and depth == 1:
+                    positions.add(position + 1)
+            elif value in ')]}':
+                depth -= 1
+                if value == '}' and depth == 1:
+                    positions.add(position + 1)
+            elif value == ';' and depth == 1:
+                positions.add(position + 1)
+        return positions
+
+    def _analyze(self, code, args):
+        var_statements = self._var_statements(code)
+        declared = set(args)
+        declaration_positions = set()
+        for position, names in var_statements:
+            declared.update(name for name, name_position in names)
+            declaration_positions.update(name_position for name, name_position in names)
+
+        reads = {}
+        for position, (kind, value, line) in enumerate(code):
+            previous = code[position - 1][:2] if position > 0 else None
+            following = code[position + 1] if position + 1 < len(code) else None
+            if kind == 'keyword' and value == 'function':
+                return None
+            if kind == 'punct' and value in self.assign_operators:
+                # only plain local names may be assigned, never properties or items
+                target_position = position - 1
+                if value in ['++', '--'] and following is not None and following[0] == 'id':
+                    target_position = position + 1
+                if target_position < 0 or code[target_position][0] != 'id' \
+                        or code[target_position][1] not in declared \
+                        or code[target_position - 1][:2] == ('punct', '.'):
+                    return None
+            if kind != 'id' or previous == ('punct', '.') or position in declaration_positions:
+                continue
+            reads.setdefault(value, position)
+
+        # the caller's variables are copied into the callee, so a var is only local
+        # when its declaration always runs before the name is read
+        local_names = set(args)
+        top_level = self._top_level_positions(code)
+        for position, names in var_statements:
+            if position not in top_level:
+                continue
+            for name, name_position in names:
+                if reads.get(name, len(code)) > position:
+                    local_names.add(name)
+        return tuple(sorted(name for name in reads if name not in local_names))
+
+    def analyze(self, function):
+        # free names of a pure function body, None if it is not pure
+        key = token_utils.function_key(function)
+        if key not in self.analysis:
+            if len(self.analysis) > self.max_functions:
+                self.analysis.clear()
+            self.analysis[key] = self._analyze(function['code'], function['args'])
+        return self.analysis[key]
+
+    def _collect(self, interpreter, function, functions, inputs):
+        # adds the functions reachable from function and the values of the outer
+        # names they read, False when a call could have effects
+        free_names = self.analyze(function)
+        if free_names is None:
+            return False
+        functions.add(token_utils.function_key(function))
+        for name in free_names:
+            if name in inputs:
+                continue
+            value = interpreter.variables_table.get(name)
+            if value is None:
+                value = interpreter.global_variables_table.get(name)
+            val_type = token_utils.type(value)
+            # exec and test move lastIndex of an outer regex
+            if val_type == 'regex':
+                return False
+            inputs[name] = token_utils.fingerprint(value)
+            if val_type != 'function_def':
+                continue
+            if value.get('name') in self.effect_functions:
+                return False
+            # natives and toString are dispatched by name, their code never runs
+            if value.get('native') or value.get('name') == 'toString':
+                continue
+            if token_utils.function_key(value) not in functions and \
+                    not self._collect(interpreter, value, functions, inputs):
+                return False
+        return True
+
+    def signature(self, interpreter, function):
+        # the code of the function and everything it calls, and the values they
+        # read from the caller, None when the call could have effects
+        functions, inputs = set(), {}
+        if not self._collect(interpreter, function, functions, inputs):
+            return None
+        return token_utils.function_key(function), tuple(sorted(functions)), tuple(sorted(inputs.items()))
+
+    def _copy_result(self, result):
+        val_type, value = result
+        if val_type == 'string':
+            return token_utils.string_token(value)
+        if val_type == 'number':
+            return token_utils.number_token(value)
+        if val_type == 'boolean':
+            return token_utils.boolean_token(value)
+        return token_utils.none_token()
+
+    def call(self, interpreter, function, args, evaluate):
+        if not self.enabled:
+            return evaluate()
+        # a missing argument would be read from the caller's variables
+        if len(args) < len(function['args']) or \
+                any(token_utils.type(arg) not in self.primitive_types for arg in args):
+            self.skipped += 1
+            return evaluate()
+        signature = self.signature(interpreter, function)
+        if signature is None:
+            self.skipped += 1
+            return evaluate()
+        arguments = tuple((token_utils.type(arg), token_utils.value(arg)) for arg in args)
+        results = self.results.get(signature)
+        if results is not None and arguments in results:
+            self.hits += 1
+            self.results.move_to_end(signature)
+            results.move_to_end(arguments)
+            return self._copy_result(results[arguments])
+        self.misses += 1
+        result = evaluate()
+        if token_utils.type(result) not in self.primitive_types:
+            return result
+        if results is None:
+            results = self.results[signature] = collections.OrderedDict()
+            if len(self.results) > self.max_functions:
+                self.results.popitem(last=False)
+        results[arguments] = (token_utils.type(result), token_utils.value(result))
+        if len(results) > self.max_size:
+            results.popitem(last=False)
+        return result
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'skipped': self.skipped,
+                'functions': len(self.results)}
+
+    def clear(self):
+        self.analysis.clear()
+        self.results.clear()
+        self.hits = self.misses = self.skipped = 0
+
+
+function_memo = FunctionMemo()
@@ -0,0 +1,83 @@
+import collections
+
+
+class PreScanner:
+    # Classifies lexed scripts without running them: 'skip' when the script can
+    # not reach the redirect traps, 'constant' when it only assigns literals to
+    # location.href and 'execute' otherwise.
+
+    # globals through which a script reaches location.href
+    redirect_names = ['location', 'window']
+
+    redirect_targets = [('location', '.', 'href'), ('window', '.', 'location', '.', 'href')]
+
+    def _ids(self, program):
+        return set(value for kind, value, line in program if kind == 'id')
+
+    def _match_target(self, program, position):
+        for target in self.redirect_targets:
+            values = tuple(token[1] for token in program[position: position + len(target)])
+            kinds = [token[0] for token in program[position: position + len(target)]]
+            if values == target and kinds == ['id', 'punct'] * (len(target) // 2) + ['id']:
+                return position + len(target)
+        return None
+
+    def _fold_string(self, program, position):
+        # "a" + "b" + ... ; only string literals are folded
+        if position >= len(program) or program[position][0] != 'string':
+            return None, position
+        parts = [program[position][1]]
+        position += 1
+        while position + 1 < len(program) and program[position][:2] == ('punct', '+') \
+                and program[position + 1][0] == 'string':
+            parts.append(program[position + 1][1])
+            position += 2
+        return ''.join(parts), position
+
+    def constant_redirect(self, program):
+        url = None
+        position = 0
+        while position < len(program):
+            if program[position][:2] == ('punct', ';'):
+                position += 1
+                continue
+            position = self._match_target(program, position)
+            if position is None or position >= len(program) \
+                    or program[position][:2] != ('punct', '='):
+                return None
+            url, position = self._fold_string(program, position + 1)
+            if url is None:
+                return None
+            if position < len(program) and program[position][:2] != ('punct', ';'):
+                return None
+        return url
+
+    def plan(self, programs):
+        modes = []
+        tainted = set(self.redirect_names)
+        for program in programs:
+            ids = self._ids(program)
+            if len(ids & tainted) == 0:
+                modes.append(['skip', None])
+                continue
+            url = self.constant_redirect(program)
+            if url is not None:
+                modes.append(['constant', url])
+                continue
+            # anything this script defines may redirect when called later
+            tainted |= ids
+            modes.append(['execute', None])
+        # scripts that cannot redirect still run when a later script uses their names
+        needed = set()
+        for index in range(len(programs) - 1, -1, -1):
+            ids = self._ids(programs[index])
+            if modes[index][0] == 'skip' and len(ids & needed) > 0:
+                modes[index][0] = 'execute'
+            if modes[index][0] == 'execute':
+                needed |= ids
+        return [tuple(mode) for mode in modes]
+
+
+pre_scanner = PreScanner()
+
+prescan_counters = collections.Counter()
@@ -0,0 +1,345 @@
+import functools
+import re
+
+from . import tokens
+from .tokens import token_utils
+
+REGEX_CACHE_SIZE = 256
+
+
+class RegexUtils:
+
+    # flags understood by the JavaScript RegExp constructor
+    js_flags = 'dgimsuy'
+
+    line_terminators = '\\n\\r\\u2028\\u2029'
+
+    # JavaScript character classes as code point ranges, Python's are Unicode aware
+    class_ranges = {
+        'd': [(0x30, 0x39)],
+        'w': [(0x30, 0x39), (0x41, 0x5a), (0x5f, 0x5f), (0x61, 0x7a)],
+        's': [(0x09, 0x0d), (0x20, 0x20), (0xa0, 0xa0), (0x1680, 0x1680), (0x2000, 0x200a),
+              (0x2028, 0x2029), (0x202f, 0x202f), (0x205f, 0x205f), (0x3000, 0x3000), (0xfeff, 0xfeff)],
+    }
+
+    def _dump_error_message(self, message):
+        print('[REGEX] Error: %s' % message)
+        print(tokens.line_number)
+        exit(0)
+
+    def _class_body(self, ranges, negate=False):
+        # the inside of a [...] class matching ranges, or every other code point
+        if negate:
+            complement = []
+            low = 0
+            for start, end in ranges:
+                if start > low:
+                    complement.append((low, start - 1))
+                low = end + 1
+            complement.append((low, 0x10ffff))
+            ranges = complement
+        return ''.join('\\U%08x' % start if start == end else '\\U%08x-\\U%08x' % (start, end)
+                       for start, end in ranges)
+
+    def _translate_escape(self, char, next_chars, in_class, unicode_mode):
+        # returns (python pattern, number of extra characters consumed)
+        if char.lower() in self.class_ranges:
+            body = self._class_body(self.class_ranges[char.lower()], char.isupper())
+            return (body if in_class else '[%s]' % body), 0
+        if char in 'bB' and not in_class:
+            word = '[%s]' % self._class_body(self.class_ranges['w'])
+            if char == 'b':
+                return '(?:(?<=%s)(?!%s)|(?<!%s)(?=%s))' % (word, word, word, word), 0
+            return '(?:(?<=%s)(?=%s)|(?<!%s)(?!%s))' % (word, word, word, word), 0
+        if char == 'c' and next_chars[:1].isalpha():
+            return '\\x%02x' % (ord(next_chars[0]) % 32), 1
+        if char == '0' and not next_chars[:1].isdigit():
+            return '\\x00', 0
+        if char == 'k' and next_chars[:1] == '<' and '>' in next_chars:
+            name = next_chars[1:next_chars.index('>')]
+            return '(?P=%s)' % name, len(name) + 2
+        if char == 'u' and unicode_mode and next_chars[:1] == '{' and '}' in next_chars:
+            code = next_chars[1:next_chars.index('}')]
+            return '\\U%08x' % int(code, 16), len(code) + 2
+        if char == 'b' and in_class:
+            return '\\x08', 0
+        if char in 'fnrtvux' or char.isdigit():
+            return '\\' + char, 0
+        # identity escape, e.g. \/ or \-
+        return re.escape(char), 0
+
+    def translate(self, pattern, flags):
+        result = []
+        in_class = False
+        unicode_mode = 'u' in flags
+        position = 0
+        while position < len(pattern):
+            char = pattern[position]
+            position += 1
+            if char == '\\':
+                if position >= len(pattern):
+                    self._dump_error_message('\\ at end of pattern /%s/' % pattern)
+                translated, consumed = self._translate_escape(
+                    pattern[position], pattern[position + 1:], in_class, unicode_mode)
+                result.append(translated)
+                position += consumed + 1
+                continue
+            if in_class:
+                if char == ']':
+                    in_class = False
+                    result.append(char)
+                elif char in '[&|~':
+                    result.append('\\' + char)
+                else:
+                    result.append(char)
+                continue
+            if char == '[':
+                if pattern.startswith('^]', position):
+                    result.append('[\\s\\S]')
+                    position += 2
+                elif pattern.startswith(']', position):
+                    result.append('(?!)')
+                    position += 1
+                else:
+                    in_class = True
+                    result.append(char)
+                    if pattern.startswith('^', position):
+                        result.append('^')
+                        position += 1
+                continue
+            if char == '(' and pattern.startswith('?<', position) \
+                    and not pattern.startswith('?<=', position) and not pattern.startswith('?<!', position):
+                result.append('(?P<')
+                position += 2
+                continue
+            if char == '.':
+                result.append('[\\s\\S]' if 's' in flags else '[^%s]' % self.line_terminators)
+                continue
+            if char == '$':
+                if 'm' in flags:
+                    result.append('(?=[%s]|\\Z)' % self.line_terminators)
+                else:
+                    result.append('\\Z')
+                continue
+            result.append(char)
+        if in_class:
+            self._dump_error_message('unterminated character class in /%s/' % pattern)
+        return ''.join(result)
+
+    @functools.lru_cache(maxsize=REGEX_CACHE_SIZE)
+    def compile(self, pattern, flags):
+        for flag in flags:
+            if flag not in self.js_flags or flags.count(flag) > 1:
+                self._dump_error_message('invalid regular expression flags %s' % flags)
+        re_flags = 0
+        if 'i' in flags:
+            re_flags |= re.IGNORECASE
+        if 'm' in flags:
+            re_flags |= re.MULTILINE
+        try:
+            return re.compile(self.translate(pattern, flags), re_flags)
+        except re.error as error:
+            self._dump_error_message('invalid regular expression /%s/: %s' % (pattern, error))
+
+    def to_regex(self, value, flags=''):
+        if token_utils.type(value) == 'regex':
+            return value
+        if token_utils.is_none(value):
+            return token_utils.regex_token('(?:)', flags)
+        return token_utils.regex_token(token_utils.to_js_string(value), flags)
+
+    def _match_at(self, regex, target):
+        # honours lastIndex for global and sticky expressions, like RegExp.prototype.exec
+        compiled = self.compile(regex['value'], regex['flags'])
+        flags = regex['flags']
+        use_last_index = 'g' in flags or 'y' in flags
+        start = int(token_utils.value(regex['lastIndex'])) if use_last_index else 0
+        if start > len(target):
+            regex['lastIndex'] = token_utils.number_token(0)
+            return None
+        if 'y' in flags:
+            match = compiled.match(target, start)
+        else:
+            match = compiled.search(target, start)
+        if use_last_index:
+            regex['lastIndex'] = token_utils.number_token(match.end() if match else 0)
+        return match
+
+    def _group_tokens(self, match):
+        return [token_utils.none_token() if group is None else token_utils.string_token(group)
+                for group in match.groups()]
+
+    def _match_result(self, match, target):
+        result = token_utils.array_token(
+            [token_utils.string_token(match.group(0))] + self._group_tokens(match))
+        result['index'] = token_utils.number_token(match.start())
+        result['input'] = token_utils.string_token(target)
+        groups = match.groupdict()
+        if len(groups) > 0:
+            result['groups'] = dict((name, token_utils.none_token() if value is None
+                                     else token_utils.string_token(value))
+                                    for name, value in groups.items())
+        else:
+            result['groups'] = token_utils.none_token()
+        return result
+
+    def regex_exec(self, regex, target):
+        match = self._match_at(regex, target)
+        if match is None:
+            return token_utils.none_token()
+        return self._match_result(match, target)
+
+    def regex_test(self, regex, target):
+        return token_utils.boolean_token(self._match_at(regex, target) is not None)
+
+    def _global_matches(self, compiled, target):
+        # like repeated exec with lastIndex: an empty match moves the search one further
+        matches = []
+        position = 0
+        while position <= len(target):
+            match = compiled.search(target, position)
+            if match is None:
+                break
+            matches.append(match)
+            position = match.end() if match.end() > match.start() else match.end() + 1
+        return matches
+
+    def string_match(self, target, pattern):
+        regex = self.to_regex(pattern)
+        if 'g' not in regex['flags']:
+            return self.regex_exec(regex, target)
+        compiled = self.compile(regex['value'], regex['flags'])
+        regex['lastIndex'] = token_utils.number_token(0)
+        matches = [token_utils.string_token(match.group(0)) for match in self._global_matches(compiled, target)]
+        if len(matches) == 0:
+            return token_utils.none_token()
+        return token_utils.array_token(matches)
+
+    def _expand_replacement(self, replacement, match, target):
+        result = []
+        position = 0
+        group_count = len(match.groups())
+        while position < len(replacement):
+            char = replacement[position]
+            next_char = replacement[position + 1: position + 2]
+            position += 1
+            if char != '$' or next_char == '':
+                result.append(char)
+                continue
+            if next_char == '$':
+                result.append('$')
+            elif next_char == '&':
+                result.append(match.group(0))
+            elif next_char == '`':
+                result.append(target[:match.start()])
+            elif next_char == "'":
+                result.append(target[match.end():])
+            elif next_char == '<' and len(match.groupdict()) > 0 and '>' in replacement[position:]:
+                name = replacement[position + 1: replacement.index('>', position)]
+                result.append(match.groupdict().get(name) or '')
+                position += len(name) + 1
+            elif next_char.isdigit():
+                digits = replacement[position: position + 2]
+                if not (digits.isdigit() and 0 < int(digits) <= group_count):
+                    digits = next_char
+                index = int(digits)
+                if 0 < index <= group_count:
+                    result.append(match.group(index) or '')
+                else:
+                    result.append('$' + digits)
+                position += len(digits) - 1
+            else:
+                result.append('$' + next_char)
+            position += 1
+        return ''.join(result)
+
+    def _replacement(self, interpreter, replacement, match, target):
+        if token_utils.type(replacement) != 'function_def':
+            return self._expand_replacement(token_utils.to_js_string(replacement), match, target)
+        args = [token_utils.string_token(match.group(0))] + self._group_tokens(match)
+        args += [token_utils.number_token(match.start()), token_utils.string_token(target)]
+        args = args[:len(replacement['args'])]
+        return token_utils.to_js_string(interpreter.eval_function_call(replacement, args))
+
+    def string_replace(self, interpreter, target, pattern, replacement):
+        if token_utils.type(pattern) != 'regex':
+            # a string pattern only replaces its first occurrence
+            pattern = token_utils.regex_token(re.escape(token_utils.to_js_string(pattern)), '')
+        compiled = self.compile(pattern['value'], pattern['flags'])
+        if 'g' in pattern['flags']:
+            pattern['lastIndex'] = token_utils.number_token(0)
+            matches = self._global_matches(compiled, target)
+        else:
+            match = self._match_at(pattern, target)
+            matches = [] if match is None else [match]
+        result = []
+        last_end = 0
+        for match in matches:
+            result.append(target[last_end: match.start()])
+            result.append(self._replacement(interpreter, replacement, match, target))
+            last_end = match.end()
+        result.append(target[last_end:])
+        return token_utils.string_token(''.join(result))
+
+    def string_split(self, target, separator, limit):
+        limit = 2 ** 32 - 1 if token_utils.is_none(limit) else int(token_utils.value(limit)) % 2 ** 32
+        if token_utils.is_none(separator):
+            values = [target]
+        elif token_utils.type(separator) != 'regex':
+            separator = token_utils.to_js_string(separator)
+            values = list(target) if separator == '' else target.split(separator)
+        else:
+            values = self._regex_split(target, separator)
+        values = values[:limit]
+        return token_utils.array_token([token_utils.none_token() if value is None
+                                        else token_utils.string_token(value) for value in values])
+
+    def _regex_split(self, target, separator):
+        # follows String.prototype.split: empty matches never split at the current position
+        compiled = self.compile(separator['value'], separator['flags'])
+        size = len(target)
+        if size == 0:
+            return [] if compiled.match(target) else [target]
+        values = []
+        position = search_from = 0
+        while search_from < size:
+            match = compiled.search(target, search_from)
+            if match is None or match.start() >= size:
+                break
+            if match.end() == position:
+                search_from = match.start() + 1
+                continue
+            values.append(target[position: match.start()])
+            values.extend(match.groups())
+            search_from = position = match.end()
+        values.append(target[position:])
+        return values
+
+    def call(self, interpreter, function_name, owner, args):
+        args = args + [token_utils.none_token()] * 2
+        if function_name == 'RegExp':
+            pattern = args[0]
+            flags = '' if token_utils.is_none(args[1]) else token_utils.to_js_string(args[1])
+            if token_utils.type(pattern) == 'regex':
+                if token_utils.is_none(args[1]):
+                    flags = pattern['flags']
+                pattern = pattern['value']
+            else:
+                pattern = '(?:)' if token_utils.is_none(pattern) else token_utils.to_js_string(pattern)
+            self.compile(pattern, flags)
+            return token_utils.regex_token(pattern, flags)
+        if function_name == 'test':
+            return self.regex_test(owner, token_utils.to_js_string(args[0]))
+        if function_name == 'exec':
+            return self.regex_exec(owner, token_utils.to_js_string(args[0]))
+        target = token_utils.to_js_string(owner)
+        if function_name == 'replace':
+            return self.string_replace(interpreter, target, args[0], args[1])
+        if function_name == 'match':
+            return self.string_match(target, args[0])
+        if function_name == 'split':
+            return self.string_split(target, args[0], args[1])
+        self._dump_error_message('unknown native function %s' % function_name)
+
+
+regex_utils = RegexUtils()
@@ -0,0 +1,70 @@
+import collections
+import hashlib
+
+from .tokens import token_utils
+
+RESULT_CACHE_SIZE = 4096
+
+
+class ResultCache:
+    # Caches the redirect url of a script keyed by its text and by the snapshot
+    # values of the globals its runs looked up. Those are the only host inputs a
+    # run can observe, so equal inputs replay the same run. The names read by
+    # every run of a script are merged, entries key on the union of them.
+
+    # looking these up means the run has effects beyond its result
+    effect_names = ['alert']
+
+    def __init__(self, enabled=True, max_size=RESULT_CACHE_SIZE):
+        self.enabled = enabled
+        self.max_size = max_size
+        self.inputs = collections.OrderedDict()
+        self.results = collections.OrderedDict()
+        self.hits = self.misses = self.skipped = 0
+
+    def script_key(self, script_text):
+        return hashlib.sha1(script_text.encode('utf-8', 'surrogatepass')).hexdigest()
+
+    def _key(self, script_key, names, table):
+        return script_key, tuple((name, token_utils.fingerprint(table.get(name))) for name in names)
+
+    def lookup(self, script_key, table):
+        # (True, url) when a run with the same inputs was cached
+        names = self.inputs.get(script_key)
+        if names is None:
+            self.misses += 1
+            return False, None
+        self.inputs.move_to_end(script_key)
+        key = self._key(script_key, names, table)
+        if key not in self.results:
+            self.misses += 1
+            return False, None
+        self.hits += 1
+        self.results.move_to_end(key)
+        return True, self.results[key]
+
+    def store(self, script_key, table, names, url):
+        if any(name in names for name in self.effect_names):
+            self.skipped += 1
+            return
+        names = tuple(sorted(set(self.inputs.get(script_key, ())) | names))
+        self.inputs[script_key] = names
+        self.inputs.move_to_end(script_key)
+        if len(self.inputs) > self.max_size:
+            self.inputs.popitem(last=False)
+        self.results[self._key(script_key, names, table)] = url
+        if len(self.results) > self.max_size:
+            self.results.popitem(last=False)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'skipped': self.skipped,
+                'hit_rate': self.hits / lookups if lookups > 0 else 0.0, 'entries': len(self.results)}
+
+    def clear(self):
+        self.inputs.clear()
+        self.results.clear()
+        self.hits = self.misses = self.skipped = 0
+
+
+result_cache = ResultCache()
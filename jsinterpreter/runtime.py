@@ -0,0 +1,200 @@
+import collections
+import re
+
+from .hooks import create_interpreter, registered_hooks
+from .interpreter import ASYNC_YIELD_EVERY
+from .lexer import get_program_cache
+from .prescan import pre_scanner, prescan_counters
+from .results import result_cache
+from .tokens import token_utils
+
+
+def create_global_variables_table():
+
+    global_variables_table = {}
+    global_variables_table['false'] = token_utils.boolean_token(False)
+    global_variables_table['true'] = token_utils.boolean_token(True)
+    global_variables_table['alert'] = token_utils.function_token('alert', [
+                                                                 'message'], '')
+    global_variables_table[
+        'toString'] = token_utils.function_token('toString', [], '')
+    global_variables_table['RegExp'] = token_utils.native_function_token(
+        'RegExp', ['pattern', 'flags'])
+
+    location = {'type': 'trap', 'value': 'window.location',
+                'href': token_utils.none_token()}
+    window = {'type': 'trap', 'value': 'window', 'location': location, 'href': token_utils.string_token('')}
+
+    global_variables_table['location'] = location
+    global_variables_table['window'] = window
+    return global_variables_table
+
+
+class ForkedTable(collections.ChainMap):
+    # globals layered over a snapshot; a snapshot value is copied into the top
+    # layer when first looked up, so no script ever holds a value it shares
+
+    def __getitem__(self, key):
+        top = self.maps[0]
+        if key in top:
+            return top[key]
+        value = top[key] = token_utils.copy_value(super().__getitem__(key))
+        return value
+
+
+class HostInputs(ForkedTable):
+    # forked globals that remember every name a run looked up
+
+    def __init__(self, *maps):
+        super().__init__(*maps)
+        self.names = set()
+
+    def __getitem__(self, key):
+        self.names.add(key)
+        return super().__getitem__(key)
+
+    def __contains__(self, key):
+        self.names.add(key)
+        return super().__contains__(key)
+
+
+class GlobalSnapshot:
+    # Global environment captured after running a prelude once. fork() layers an
+    # empty table over it, so every script only pays for the bindings it uses.
+
+    def __init__(self, prelude=None, hooks=None):
+        self.table = create_global_variables_table()
+        if prelude is not None:
+            interpreter = create_interpreter(hooks)
+            try:
+                interpreter.load(prelude, global_variables_table=self.table)
+                interpreter.run()
+                # top level var statements of the prelude are globals of the page
+                self.table.update(interpreter.variables_table)
+            finally:
+                interpreter.close()
+
+    def fork(self, record=False):
+        # record=True returns a table that remembers the names looked up in it
+        table = HostInputs({}, self.table) if record else ForkedTable({}, self.table)
+        # window.location is location, so the traps are copied together
+        window = token_utils.copy_value(self.table['window'])
+        location = window['location'] = token_utils.copy_value(self.table['location'])
+        table.maps[0]['location'] = location
+        table.maps[0]['window'] = window
+        return table
+
+
+default_snapshot = None
+
+
+def get_snapshot(snapshot=None):
+    global default_snapshot
+    if snapshot is None:
+        if default_snapshot is None:
+            default_snapshot = GlobalSnapshot()
+        snapshot = default_snapshot
+    return snapshot
+
+
+def fork_global_variables_table(snapshot=None):
+    return get_snapshot(snapshot).fork()
+
+
+def script_text(script_text, hooks=None, snapshot=None, engine='interpreter'):
+
+    snapshot = get_snapshot(snapshot)
+    # hooks have to see the run happen
+    cached = result_cache.enabled and isinstance(script_text, str) and \
+        len(registered_hooks if hooks is None else hooks) == 0
+    if cached:
+        script_key = result_cache.script_key(script_text)
+        found, url = result_cache.lookup(script_key, snapshot.table)
+        if found:
+            return url
+
+    global_variables_table = snapshot.fork(record=cached)
+    location = global_variables_table['location']
+
+    interpreter = create_interpreter(hooks, engine)
+    try:
+        interpreter.load(
+            script_text, global_variables_table=global_variables_table)
+        interpreter.run()
+
+        # find the redirect url
+        url = token_utils.value(location['href'])
+        if cached:
+            result_cache.store(script_key, snapshot.table, global_variables_table.names, url)
+        return url
+    finally:
+        interpreter.close()
+        global_variables_table.clear()
+
+
+async def run_async(script_text, yield_every=ASYNC_YIELD_EVERY, timeout=None, hooks=None, snapshot=None,
+                    engine='interpreter'):
+    # coroutine version of script_text, raises TimeoutError once timeout seconds pass
+
+    global_variables_table = fork_global_variables_table(snapshot)
+    location = global_variables_table['location']
+
+    interpreter = create_interpreter(hooks, engine)
+    interpreter.load(
+        script_text, global_variables_table=global_variables_table)
+    try:
+        await interpreter.run_async(yield_every, timeout)
+        return token_utils.value(location['href'])
+    finally:
+        # drop the per-run state promptly when cancelled or timed out
+        interpreter.close()
+        global_variables_table.clear()
+
+
+def run_scripts(scripts, prescan=False, hooks=None, snapshot=None, engine='interpreter'):
+    # runs the scripts of one page in a shared global environment
+
+    global_variables_table = fork_global_variables_table(snapshot)
+    location = global_variables_table['location']
+
+    programs = [get_program_cache().parse(script) for script in scripts]
+    if prescan:
+        plan = pre_scanner.plan(programs)
+    else:
+        plan = [('execute', None)] * len(programs)
+
+    try:
+        for program, (mode, url) in zip(programs, plan):
+            prescan_counters[mode] += 1
+            if mode == 'constant':
+                location['href'] = token_utils.string_token(url)
+            if mode == 'execute':
+                interpreter = create_interpreter(hooks, engine)
+                try:
+                    interpreter.load(
+                        program, global_variables_table=global_variables_table)
+                    interpreter.run()
+                    # top level vars of a script are globals of the page for the scripts after it
+                    global_variables_table.update(interpreter.variables_table)
+                finally:
+                    interpreter.close()
+
+        return token_utils.value(location['href'])
+    finally:
+        global_variables_table.clear()
+
+
+def run_script_file(filename, prescan=False, snapshot=None, dump_file=None, engine='interpreter'):
+    with open(filename, 'r') as txt:
+        html = txt.read()
+        text = re.sub('<[^>]*>', '', html)
+    if dump_file is not None:
+        with open(dump_file, 'w') as output:
+            output.write(text.replace('\n', ' '))
+
+    if prescan:
+        scripts = re.findall(r'<script\b[^>]*>(.*?)</script\s*>', html, re.IGNORECASE | re.DOTALL)
+        if len(scripts) == 0:
+            scripts = [text]
+        return run_scripts(scripts, prescan=True, snapshot=snapshot, engine=engine)
+    return script_text(text, snapshot=snapshot, engine=engine)
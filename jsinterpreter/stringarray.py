@@ -0,0 +1,460 @@
+import collections
+import math
+import re
+
+from .tokens import token_utils
+
+STRING_ARRAY_CACHE_SIZE = 256
+
+
+class NoMatch(Exception):
+    # the program does not follow the string array layout exactly
+    pass
+
+
+class Cursor:
+    # reads a lexed program, any unexpected token raises NoMatch
+
+    def __init__(self, program, position=0):
+        self.program = program
+        self.position = position
+
+    def peek(self, offset=0):
+        if self.position + offset >= len(self.program):
+            return ('eof', None, 0)
+        return self.program[self.position + offset]
+
+    def at(self, value, offset=0):
+        kind, token_value, line = self.peek(offset)
+        return token_value == value and kind in ('punct', 'keyword', 'id')
+
+    def accept(self, value):
+        if self.at(value):
+            self.position += 1
+            return True
+        return False
+
+    def expect(self, value):
+        if not self.accept(value):
+            raise NoMatch('expect %s' % value)
+
+    def take(self, kind):
+        token_kind, value, line = self.peek()
+        if token_kind != kind:
+            raise NoMatch('expect %s' % kind)
+        self.position += 1
+        return value
+
+    def name(self, expected=None):
+        value = self.take('id')
+        if expected is not None and value != expected:
+            raise NoMatch('expect %s' % expected)
+        return value
+
+
+class StringArrayFastPath:
+    # Recognizes the prologue common obfuscators emit and runs it in Python:
+    #
+    #   var A = ['...', ...];
+    #   (function (a, n) { var f = function (c) { while (--c) { a['push'](a['shift']()); } }; f(++n); }(A, 0x1b3));
+    #   (function (a, t) { while (!![]) { try { var s = <parseInt(D(0x1a)) arithmetic>;
+    #       if (s === t) break; else a['push'](a['shift']()); } catch (e) { a['push'](a['shift']()); } } }(A, 0x3e8f1));
+    #   var D = function (i, k) { i = i - 0x0; var v = A[i]; return v; };   or   function D(i, k) { ... }
+    #
+    # The array is rotated natively and the decoder becomes a native function over
+    # the table computed once per program. Anything else, or a checksum that never
+    # matches, is left to the interpreter.
+
+    def __init__(self, enabled=True, max_size=STRING_ARRAY_CACHE_SIZE):
+        self.enabled = enabled
+        self.max_size = max_size
+        # id(program) -> (program, match or None)
+        self.programs = collections.OrderedDict()
+        self.hits = self.misses = 0
+
+    # layout
+
+    def _array(self, cursor):
+        if not (cursor.accept('var') or cursor.accept('let') or cursor.accept('const')):
+            raise NoMatch('expect var')
+        array_name = cursor.name()
+        cursor.expect('=')
+        cursor.expect('[')
+        strings = []
+        while not cursor.accept(']'):
+            strings.append(cursor.take('string'))
+            if not cursor.accept(','):
+                cursor.expect(']')
+                break
+        cursor.expect(';')
+        if len(strings) == 0:
+            raise NoMatch('empty string array')
+        return array_name, strings
+
+    def _property(self, cursor, name):
+        if cursor.accept('['):
+            if cursor.take('string') != name:
+                raise NoMatch('expect %s' % name)
+            cursor.expect(']')
+            return
+        cursor.expect('.')
+        cursor.name(name)
+
+    def _rotate(self, cursor, array):
+        # a['push'](a['shift']());
+        cursor.name(array)
+        self._property(cursor, 'push')
+        cursor.expect('(')
+        cursor.name(array)
+        self._property(cursor, 'shift')
+        cursor.expect('(')
+        cursor.expect(')')
+        cursor.expect(')')
+        cursor.expect(';')
+
+    def _number(self, cursor):
+        negative = cursor.accept('-')
+        value = cursor.take('number')
+        return -value if negative else value
+
+    def _counted_rotation(self, cursor, array, count):
+        cursor.expect('var')
+        rotate_name = cursor.name()
+        cursor.expect('=')
+        cursor.expect('function')
+        cursor.expect('(')
+        counter = cursor.name()
+        cursor.expect(')')
+        cursor.expect('{')
+        cursor.expect('while')
+        cursor.expect('(')
+        cursor.expect('--')
+        cursor.name(counter)
+        cursor.expect(')')
+        cursor.expect('{')
+        self._rotate(cursor, array)
+        cursor.expect('}')
+        cursor.expect('}')
+        cursor.expect(';')
+        cursor.name(rotate_name)
+        cursor.expect('(')
+        cursor.expect('++')
+        cursor.name(count)
+        cursor.expect(')')
+        cursor.expect(';')
+
+        def rotations(strings, argument, decode):
+            # while (--c) with c = n + 1 rotates n times, and never stops for other n
+            if argument < 0 or argument != int(argument):
+                raise NoMatch('rotation never ends')
+            return int(argument) % len(strings)
+        return rotations, []
+
+    def _checksum_rotation(self, cursor, array, target):
+        # var x = D; aliases of the decoder, then the loop
+        aliases = []
+        while cursor.accept('var'):
+            alias = cursor.name()
+            cursor.expect('=')
+            aliases.append((alias, cursor.name()))
+            cursor.expect(';')
+        cursor.expect('while')
+        cursor.expect('(')
+        cursor.expect('!')
+        cursor.expect('!')
+        cursor.expect('[')
+        cursor.expect(']')
+        cursor.expect(')')
+        cursor.expect('{')
+        cursor.expect('try')
+        cursor.expect('{')
+        cursor.expect('var')
+        checksum_name = cursor.name()
+        cursor.expect('=')
+        calls = []
+        checksum = self._sum(cursor, calls)
+        cursor.expect(';')
+        cursor.expect('if')
+        cursor.expect('(')
+        cursor.name(checksum_name)
+        cursor.expect('===')
+        cursor.name(target)
+        cursor.expect(')')
+        cursor.expect('break')
+        cursor.expect(';')
+        cursor.expect('else')
+        self._rotate(cursor, array)
+        cursor.expect('}')
+        cursor.expect('catch')
+        cursor.expect('(')
+        cursor.name()
+        cursor.expect(')')
+        cursor.expect('{')
+        self._rotate(cursor, array)
+        cursor.expect('}')
+        cursor.expect('}')
+
+        def rotations(strings, argument, decode):
+            strings = list(strings)
+            for rotation in range(len(strings)):
+                if checksum(lambda index: decode(strings, index)) == argument:
+                    return rotation
+                strings.append(strings.pop(0))
+            # the loop would never end, leave it to the interpreter
+            raise NoMatch('checksum never matches')
+
+        # names the checksum calls, resolved through the aliases
+        names = dict(aliases)
+        return rotations, [names.get(name, name) for name in calls]
+
+    def _rotation(self, cursor, array_name):
+        # (function (a, n) { ... }(A, 0x1b3));  or  (function (a, n) { ... })(A, 0x1b3);
+        cursor.expect('(')
+        cursor.expect('function')
+        cursor.expect('(')
+        array = cursor.name()
+        cursor.expect(',')
+        argument_name = cursor.name()
+        cursor.expect(')')
+        cursor.expect('{')
+        if cursor.at('var') and cursor.at('=', 2) and cursor.at('function', 3):
+            rotations, calls = self._counted_rotation(cursor, array, argument_name)
+        else:
+            rotations, calls = self._checksum_rotation(cursor, array, argument_name)
+        cursor.expect('}')
+        closed = cursor.accept(')')
+        cursor.expect('(')
+        cursor.name(array_name)
+        cursor.expect(',')
+        argument = self._number(cursor)
+        cursor.expect(')')
+        if not closed:
+            cursor.expect(')')
+        cursor.accept(';')
+        return rotations, argument, calls
+
+    def _decoder(self, cursor, array_name):
+        if cursor.accept('function'):
+            decoder_name = cursor.name()
+            expression = False
+        else:
+            cursor.expect('var')
+            decoder_name = cursor.name()
+            cursor.expect('=')
+            cursor.expect('function')
+            expression = True
+        cursor.expect('(')
+        index = cursor.name()
+        if cursor.accept(','):
+            cursor.name()
+        cursor.expect(')')
+        cursor.expect('{')
+        offset = None
+        if cursor.at(index) and cursor.at('=', 1):
+            cursor.name(index)
+            cursor.expect('=')
+            cursor.name(index)
+            cursor.expect('-')
+            offset = cursor.take('number')
+            cursor.expect(';')
+        if cursor.accept('var'):
+            value = cursor.name()
+            cursor.expect('=')
+            self._element(cursor, array_name, index)
+            cursor.expect(';')
+            cursor.expect('return')
+            cursor.name(value)
+        else:
+            cursor.expect('return')
+            self._element(cursor, array_name, index)
+        cursor.expect(';')
+        cursor.expect('}')
+        if expression:
+            cursor.expect(';')
+        return decoder_name, offset, expression
+
+    def _element(self, cursor, array_name, index):
+        cursor.name(array_name)
+        cursor.expect('[')
+        cursor.name(index)
+        cursor.expect(']')
+
+    # checksum arithmetic: parseInt(D(0x1a)) terms with + - * / and unary minus
+
+    def _sum(self, cursor, calls):
+        left = self._product(cursor, calls)
+        while cursor.at('+') or cursor.at('-'):
+            operator = cursor.take('punct')
+            left = self._arithmetic(left, operator, self._product(cursor, calls))
+        return left
+
+    def _product(self, cursor, calls):
+        left = self._unary(cursor, calls)
+        while cursor.at('*') or cursor.at('/'):
+            operator = cursor.take('punct')
+            left = self._arithmetic(left, operator, self._unary(cursor, calls))
+        return left
+
+    def _arithmetic(self, left, operator, right):
+        def arithmetic(decode):
+            a = left(decode)
+            b = right(decode)
+            if operator == '+':
+                return a + b
+            if operator == '-':
+                return a - b
+            if operator == '*':
+                return a * b
+            if b == 0:
+                if a == 0 or math.isnan(a):
+                    return math.nan
+                return math.copysign(math.inf, a) * math.copysign(1, b)
+            return a / b
+        return arithmetic
+
+    def _unary(self, cursor, calls):
+        if cursor.accept('-'):
+            operand = self._unary(cursor, calls)
+            return lambda decode: -operand(decode)
+        if cursor.accept('('):
+            inner = self._sum(cursor, calls)
+            cursor.expect(')')
+            return inner
+        kind, value, line = cursor.peek()
+        if kind == 'number':
+            cursor.position += 1
+            return lambda decode: value
+        cursor.name('parseInt')
+        cursor.expect('(')
+        calls.append(cursor.name())
+        cursor.expect('(')
+        argument = self._argument(cursor)
+        if cursor.accept(','):
+            self._argument(cursor)
+        cursor.expect(')')
+        cursor.expect(')')
+        return lambda decode: self.parse_int(decode(argument))
+
+    def _argument(self, cursor):
+        if cursor.peek()[0] == 'string':
+            return cursor.take('string')
+        return self._number(cursor)
+
+    def parse_int(self, value):
+        # JavaScript parseInt of a string, NaN for undefined or no digits
+        if value is None:
+            return math.nan
+        match = re.match(r'\s*([+-]?)(0[xX][0-9a-fA-F]+|[0-9]+)', value)
+        if match is None:
+            return math.nan
+        digits = match.group(2)
+        number = float(int(digits, 16) if digits[:2] in ('0x', '0X') else int(digits))
+        return -number if match.group(1) == '-' else number
+
+    # decoding
+
+    def to_index(self, value, offset):
+        # the array index JavaScript computes from a decoder argument, None if there is none
+        if offset is not None:
+            # i = i - offset converts the argument like Number() does
+            if isinstance(value, str):
+                text = value.strip()
+                try:
+                    if text[:2] in ('0x', '0X'):
+                        value = float(int(text[2:], 16))
+                    elif re.fullmatch(r'[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?', text):
+                        value = float(text)
+                    elif text == '':
+                        value = 0.0
+                    else:
+                        return None
+                except ValueError:
+                    return None
+            value = value - offset
+        elif isinstance(value, str):
+            # A['5'] is A[5], other strings are no index
+            return int(value) if value.isdigit() and str(int(value)) == value else None
+        if not math.isfinite(value) or value != int(value):
+            return None
+        return int(value)
+
+    def _decode(self, strings, argument, offset):
+        index = self.to_index(argument, offset)
+        if index is None or not 0 <= index < len(strings):
+            return None
+        return strings[index]
+
+    def _match(self, program):
+        cursor = Cursor(program)
+        array_name, strings = self._array(cursor)
+        # the rotation and the decoder follow the array in either order
+        if cursor.at('('):
+            rotations, argument, calls = self._rotation(cursor, array_name)
+            decoder_name, offset, expression = self._decoder(cursor, array_name)
+            # a decoder expression assigned after the rotation is undefined inside it
+            if expression and len(calls) > 0:
+                raise NoMatch('decoder used before it is assigned')
+        else:
+            decoder_name, offset, expression = self._decoder(cursor, array_name)
+            rotations, argument, calls = self._rotation(cursor, array_name)
+        if any(name != decoder_name for name in calls):
+            raise NoMatch('checksum calls an unknown function')
+
+        def decode(strings, index):
+            return self._decode(strings, index, offset)
+
+        count = rotations(strings, argument, decode)
+        return {'end': cursor.position, 'array': array_name, 'table': tuple(strings[count:] + strings[:count]),
+                'decoder': decoder_name, 'offset': offset, 'declaration': not expression,
+                'code': program[:cursor.position]}
+
+    def match(self, program):
+        # the recognized prologue of a lexed program, None when it does not fit
+        entry = self.programs.get(id(program))
+        if entry is not None and entry[0] is program:
+            self.programs.move_to_end(id(program))
+            return entry[1]
+        try:
+            found = self._match(program)
+        except NoMatch:
+            found = None
+        self.programs[id(program)] = (program, found)
+        if len(self.programs) > self.max_size:
+            self.programs.popitem(last=False)
+        return found
+
+    def apply(self, interpreter):
+        # binds the rotated array and the decoder, then skips the prologue
+        if not self.enabled:
+            return
+        found = self.match(interpreter.tokens)
+        if found is None:
+            self.misses += 1
+            return
+        self.hits += 1
+        array = token_utils.array_token([token_utils.string_token(value) for value in found['table']])
+        interpreter.register_variable(found['array'], array, [])
+        decoder = token_utils.native_function_token(found['decoder'], ['index', 'key'])
+        # the prologue determines the table, so it keys the decoder like user code
+        decoder['code'] = found['code']
+        decoder['string_table'] = found['table']
+        decoder['offset'] = found['offset']
+        if found['declaration']:
+            interpreter.global_variables_table[found['decoder']] = decoder
+        else:
+            interpreter.register_variable(found['decoder'], decoder, [])
+        interpreter.position = found['end']
+
+    def call(self, function, args):
+        if len(args) == 0:
+            return token_utils.none_token()
+        value = token_utils.value(args[0])
+        if not token_utils.is_string(args[0]) and not token_utils.is_number(args[0]):
+            return token_utils.none_token()
+        decoded = self._decode(function['string_table'], value, function['offset'])
+        if decoded is None:
+            return token_utils.none_token()
+        return token_utils.string_token(decoded)
+
+
+string_array_fast_path = StringArrayFastPath()
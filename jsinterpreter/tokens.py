@@ -0,0 +1,271 @@
+import hashlib
+import marshal
+
+line_number = 0
+
+
+class TokenUtils:
+
+    # argument names of the native methods, keyed by the owner type
+    native_methods = {
+        'string': {'toString': [], 'replace': ['pattern', 'replacement'],
+                   'match': ['regexp'], 'split': ['separator', 'limit']},
+        'number': {'toString': []},
+        'boolean': {'toString': []},
+        'array': {'toString': []},
+        'regex': {'toString': [], 'test': ['string'], 'exec': ['string']},
+    }
+
+    def _dump_error_message(self, message):
+        print('[TOKEN] Error: %s' % message)
+        print(line_number)
+        exit(0)
+
+    def _dump_warning_message(self, message):
+        print('[TOKEN] Warning: %s' % message)
+        return
+
+    def string_token(self, value):
+        return {'type': 'string', 'value': value, 'toString': self.variable_token('toString')}
+
+    def number_token(self, value):
+        return {'type': 'number', 'value': float(value), 'toString': self.variable_token('toString')}
+
+    def boolean_token(self, value):
+        return {'type': 'boolean', 'value': value, 'toString': self.variable_token('toString')}
+
+    def variable_token(self, value):
+        return {'type': 'id', 'value': value}
+
+    def regex_token(self, value, flags):
+        return {'type': 'regex', 'value': value, 'flags': flags,
+                'source': self.string_token(value),
+                'global': self.boolean_token('g' in flags),
+                'lastIndex': self.number_token(0),
+                'toString': self.variable_token('toString')}
+
+    def array_token(self, values):
+        return {'type': 'array', 'value': values, 'length': self.number_token(len(values)),
+                'toString': self.variable_token('toString')}
+
+    def none_token(self):
+        return {'type': 'none', 'value': 'none'}
+
+    def if_token(self, expression, true_stmt, false_stmt):
+        return {'type': 'if',
+                'expression': expression,
+                'true_stmt': true_stmt,
+                'false_stmt': false_stmt}
+
+    def operator_token(self, value, priority, args):
+        token = {'type': 'operator'}
+        token['value'] = value
+        token['priority'] = priority
+        token['args'] = args
+        return token
+
+    def function_token(self, function_name, args, code):
+        token = {'type': 'function_def'}
+        token['name'] = function_name
+        token['args'] = args
+        token['code'] = code
+        return token
+
+    def function_key(self, function):
+        # hashing the token tuple on every call would cost as much as running it
+        if 'code_key' not in function:
+            code = marshal.dumps((function['code'], tuple(function['args'])))
+            function['code_key'] = hashlib.sha1(code).hexdigest()
+        return function['code_key']
+
+    def copy_value(self, value):
+        # deep copy of a value, code tuples and strings are shared
+        if isinstance(value, dict):
+            return {key: self.copy_value(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self.copy_value(item) for item in value]
+        return value
+
+    def fingerprint(self, value):
+        # hashable summary of a value, equal for values a script cannot tell apart
+        if isinstance(value, dict):
+            if self.type(value) == 'function_def':
+                return ('function_def', value.get('name'), bool(value.get('native')), self.function_key(value))
+            return tuple(sorted((key, self.fingerprint(item))
+                                for key, item in value.items() if key != 'parents'))
+        if isinstance(value, list):
+            return tuple(self.fingerprint(item) for item in value)
+        return value
+
+    def native_function_token(self, function_name, args, owner=None):
+        token = self.function_token(function_name, args, '')
+        token['native'] = True
+        if owner is not None:
+            token['self'] = owner
+        return token
+
+    def native_method(self, owner, name):
+        # methods are resolved lazily so that every string token does not carry them;
+        # the returned stub refers to its owner, never the other way round
+        if name in self.native_methods.get(self.type(owner), {}):
+            token = self.variable_token(name)
+            token['self'] = owner
+            return token
+        return None
+
+    def method_token(self, name, owner):
+        args = self.native_methods.get(self.type(owner), {}).get(name, [])
+        return self.native_function_token(name, args, owner)
+
+    def to_js_string(self, value):
+        val_type = self.type(value)
+        val = self.value(value)
+        if val_type == 'number':
+            if val != val:
+                return 'NaN'
+            if val in (float('inf'), float('-inf')):
+                return 'Infinity' if val > 0 else '-Infinity'
+            return '%d' % val if val.is_integer() else repr(val)
+        if val_type == 'boolean':
+            return 'true' if val else 'false'
+        if val_type == 'none':
+            return 'undefined'
+        if val_type == 'array':
+            return ','.join('' if self.is_none(x) else self.to_js_string(x) for x in val)
+        if val_type == 'regex':
+            return '/%s/%s' % (val, value['flags'])
+        return str(val)
+
+    def convert_to_string(self, value):
+        return self.string_token(self.to_js_string(value))
+
+    def convert_to_boolean(self, value):
+        val_type = self.type(value)
+        if val_type == 'boolean':
+            return value
+        if val_type == 'string':
+            return True
+        if val_type == 'number':
+            return self.boolean_token(self.value(value) != 0)
+        if val_type == 'none':
+            return self.boolean_token(False)
+        if val_type in ['array', 'regex', 'function_def', 'trap']:
+            return self.boolean_token(True)
+
+        print('Cannot convert %s to boolean' % val_type)
+        return self.boolean_token(False)
+
+    def type(self, value):
+        if isinstance(value, dict) and value.get('type') is not None:
+            return value['type']
+        if isinstance(value, str):
+            return 'string'
+        if isinstance(value, float):
+            return 'number'
+        if value is None:
+            return 'none'
+        self._dump_error_message('Cannot decide the type of %s' % value)
+
+    def is_string(self, value): return self.type(value) == 'string'
+
+    def is_number(self, value): return self.type(value) == 'number'
+
+    def is_operator(self, value): return self.type(value) == 'operator'
+
+    def value(self, value):
+        if value is None:
+            return self.none_token()
+        if isinstance(value, dict) and value.get('value') is not None:
+            return value['value']
+        # Guess the type of value to avoid critical error
+        if isinstance(value, str) or isinstance(value, float):
+            return value
+        if isinstance(value, dict) and self.type(value) == 'function_def':
+            return value['name']
+        return value
+        self._dump_error_message('Cannot get the true value of %s' % value)
+
+    def _string_add_rule(self, val_1, val_2, operator):
+        if self.is_operator(operator) and self.value(operator) == '+':
+            if self.is_string(val_1) or self.is_string(val_2):
+                s1 = self.to_js_string(val_1)
+                s2 = self.to_js_string(val_2)
+                return self.string_token(s1 + s2)
+        return None
+
+    def _number_arth_rule(self, val_1, val_2, operator):
+        if self.is_operator(operator) and self.value(operator) in '+-*/':
+            if self.is_number(val_1) and self.is_number(val_2):
+                ope = self.value(operator)
+                n1 = self.value(val_1)
+                n2 = self.value(val_2)
+                if ope == '+':
+                    return self.number_token(n1 + n2)
+                if ope == '-':
+                    return self.number_token(n1 - n2)
+                if ope == '*':
+                    return self.number_token(n1 * n2)
+                if ope == '/':
+                    return self.number_token(n1 / n2)
+        return None
+
+    def _boolean_and_or_rule(self, val_1, val_2, operator):
+        if self.is_operator(operator):
+            ope = self.value(operator)
+            if ope in ['&&', '||']:
+                b1 = self.value(self.convert_to_boolean(val_1))
+                b2 = self.value(self.convert_to_boolean(val_2))
+                if ope == '&&':
+                    return self.boolean_token(b1 and b2)
+                return self.boolean_token(b1 or b2)
+        return None
+
+    def _boolean_expression_rule(self, val_1, val_2, operator):
+        if self.is_operator(operator):
+            ope = self.value(operator)
+            t1 = self.type(val_1)
+            t2 = self.type(val_2)
+            v1 = self.value(val_1)
+            v2 = self.value(val_2)
+            if ope in ['===', '!==']:
+                result = t1 == t2 and v1 == v2
+                return self.boolean_token(result if ope == '===' else not result)
+            if ope in ['==', '<=', '>=', '!=', '<', '>']:
+                if t1 != t2:
+                    self._dump_error_message(
+                        'Cannot use %s on different type: %s and %s' % (ope, t1, t2))
+                result = False
+                if ope == '==':
+                    result = v1 == v2
+                if ope == '<=':
+                    result = v1 <= v2
+                if ope == '>=':
+                    result = v1 >= v2
+                if ope == '<':
+                    result = v1 < v2
+                if ope == '>':
+                    result = v1 > v2
+                if ope == '!=' or ope == '<>':
+                    result = v1 != v2
+                return self.boolean_token(result)
+
+        return None
+
+    def double_operator(self, val_1, val_2, operator):
+        token = self._string_add_rule(val_1, val_2, operator)
+        if token is None:
+            token = self._number_arth_rule(val_1, val_2, operator)
+        if token is None:
+            token = self._boolean_and_or_rule(val_1, val_2, operator)
+        if token is None:
+            token = self._boolean_expression_rule(val_1, val_2, operator)
+        if token is None:
+            self._dump_error_message(
+                'Unknown operation %s on %s, %s' % (operator, val_1, val_2))
+        return token
+
+    def is_none(self, val):
+        return self.type(val) == 'none'
+
+
+token_utils = TokenUtils()